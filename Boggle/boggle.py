@@ -1,4 +1,5 @@
 import tkinter as tk
+from math import ceil
 import boggle_engine as bg
     
 class Boggle():
@@ -9,13 +10,18 @@ class Boggle():
         adds a game frame where the player interacts with the board and plays boggle
         presents all game info: score, timer, collected words and the validity of the current word.
     """
-    def __init__(self,boggleDict,gameTime):
+    def __init__(self,boggleDict,gameTime,rows=4,cols=4):
         self.HEIGHT = "500"
         self.WIDTH = "600"
         self.playing = False
         self.gameTime = gameTime
         self.boggleDict = boggleDict
+        self.rows = rows
+        self.cols = cols
         self.remainGrid = None
+        self.timerJob = None # Pending 'after' call of UpdateTimer, only while a game is running
+        self.shownTime = None # Time on the timer label
+        self.prefetcher = bg.BoardPrefetcher(boggleDict,rows,cols) # Solved boards are ready before Play is pressed
         
         # root properties
         self.root = tk.Tk()
@@ -26,7 +32,6 @@ class Boggle():
 
         self.MakeGameFrame()
         self.MakeMenuFrame()
-        self.UpdateTimer()
         self.menuFrame.tkraise()
         self.root.mainloop()
         
@@ -64,10 +69,11 @@ class Boggle():
         # boggle grid
         self.gridframe = tk.Frame(self.gameFrame,bg='green')
         self.gridframe.place(relx=0.4,rely=0.1,anchor='n')
-        self.buttonGrid = [[None for x in range(4)] for y in range(4)] 
-        for row in range(4):
-            for col in range(4):
-                self.buttonGrid[row][col] = tk.Button(self.gridframe, font=('Courier',28),bg='black',fg='green',
+        fontSize = 28*4//max(self.rows,self.cols) # Larger boards get smaller letters
+        self.buttonGrid = [[None for x in range(self.cols)] for y in range(self.rows)] 
+        for row in range(self.rows):
+            for col in range(self.cols):
+                self.buttonGrid[row][col] = tk.Button(self.gridframe, font=('Courier',fontSize),bg='black',fg='green',
                                                        text='#', 
                                    command=lambda row=row, col=col: self.GridCallback(row,col))
                 self.buttonGrid[row][col].grid(row=row, column=col, sticky="nsew")
@@ -102,17 +108,31 @@ class Boggle():
         
 
     def UpdateTimer(self):
-        """ Update the game timer and end the game when time runs out"""
-        self.root.after(10, self.UpdateTimer)
-        if self.playing:
-            self.boggleGame.Timer()
-            self.timer['text']= self.boggleGame.timeLeft
-            if self.boggleGame.timeLeft <=0:
-                self.EndGame()
+        """ Update the game timer and end the game when time runs out,
+            it's called again only when the shown second changes (nothing runs in the menu)"""
+        self.timerJob = None
+        if not self.playing:
+            return
+        self.boggleGame.Timer()
+        timeLeft = self.boggleGame.timeLeft
+        if timeLeft != self.shownTime:
+            self.timer['text'] = timeLeft
+            self.shownTime = timeLeft
+        if timeLeft <= 0:
+            self.EndGame()
+            return
+        # The label changes when the time left drops to the next whole second
+        delay = ceil((self.boggleGame.SecondsLeft()-(timeLeft-1))*1000)
+        self.timerJob = self.root.after(max(delay,1), self.UpdateTimer)
                     
     def EndGame(self):
         """ Stop the timer and return to the main menu """
+        if not self.playing: # Already ended
+            return
         self.playing=False
+        if self.timerJob != None:
+            self.root.after_cancel(self.timerJob)
+            self.timerJob = None
         self.game_overLabel['text']='Game over! Score: {}'.format(self.boggleGame.score)
         self.game_overLabel.place(relx=0.5,rely=0.2,anchor='n')
         self.playButton['text']='Play Again'
@@ -141,7 +161,6 @@ class Boggle():
                 self.foundList.insert(0, currentWord)
                 self.currentWord['text']= 'You found {}!'.format(currentWord)
                 self.currentWord['fg'] = 'light green'
-                self.wordsByLength[len(currentWord)]-=1
                 self.RemainingWordsUpdate()
             else:
                 self.currentWord['text']= 'You already found {}'.format(currentWord)
@@ -158,6 +177,8 @@ class Boggle():
         self.ResetGame()
         self.gameFrame.tkraise()
         self.playing=True
+        self.shownTime = None
+        self.UpdateTimer()
 
     def RemainingWordsUpdate(self):
         if self.maxLetters<=7:
@@ -179,21 +200,14 @@ class Boggle():
                 if wordLength > self.maxLetters: pass
                 else:
                     self.remainGrid[row][col] = tk.Label(self.remainingWordsLabel, font=('Courier',fontSize),bg='black',fg='light green',
-                                                           text=" {}: {} ".format(wordLength, self.wordsByLength[wordLength]))
+                                                           text=" {}: {} ".format(wordLength, self.boggleGame.remainingByLength.get(wordLength,0)))
                     self.remainGrid[row][col].grid(row=row, column=col, sticky="n",ipadx=1)
         
     def ResetGame(self):
         """ Reset all the relevant parameters to start a new boggle game"""
-        board = bg.RandomBoard(self.boggleDict)
-        self.boggleGame = bg.BoggleEngine(board,self.boggleDict,self.gameTime)
-        self.wordList = FindAllWords(board,boggleDict)
-        self.wordsByLength = WordsByLength(self.wordList)
-        self.maxLetters = max(self.wordsByLength, key=int)
-        # Fill out the dictionary
-        for i in range(16):
-            if i not in self.wordsByLength.keys():
-                self.wordsByLength[i]=0
-        self.wordsByLength = {k: v for k, v in sorted(self.wordsByLength.items(), key=lambda item: item[0])}
+        board,wordList = self.prefetcher.Get()
+        self.boggleGame = bg.BoggleEngine(board,self.boggleDict,self.gameTime,wordList)
+        self.maxLetters = max(self.boggleGame.wordsByLength, default=0)
         self.RemainingWordsUpdate()
         self.ResetGridColors()
         self.foundList.delete(0,'end')
@@ -203,14 +217,12 @@ class Boggle():
         
     def ResetGridColors(self):
         """ Reset the boggle grid highlights"""
-        for r in range(4):
-            for c in range(4):
+        for r in range(self.rows):
+            for c in range(self.cols):
                 self.buttonGrid[r][c]['bg']='black'
                 self.buttonGrid[r][c]['fg']='light green'
                 self.buttonGrid[r][c]['text']=self.boggleGame.board[r][c]
 
 if __name__=="__main__":
-    from boggle_solver import *
-    
-    boggleDict = bg.ImportBoggleDict()  
+    boggleDict = bg.LoadBoggleDict() # Compiled dictionary, it's also the solver's DAWG
     boggle=Boggle(boggleDict,gameTime=180)
@@ -0,0 +1,235 @@
+"""
+Boggle board statistics over a stream of random boards,
+boards are generated and solved in chunks by worker processes (every chunk has its own seed,
+so a run is reproducible and no boards are sent between processes).
+Every worker turns its chunk into a finished row group of the output file, and returns it with
+small histograms, which the main process appends to the file and adds to the running totals
+(word count and score histograms, words by length, number of boards every word is on).
+Only a bounded window of chunks is pending at a time, so memory doesn't depend on the number of boards.
+
+Output file - a header and row groups, every row group holds the columns of its boards,
+each column is a zlib compressed little endian array:
+    board      uint8 (n, rows*cols) tile codes (boggle_dict.TILES)
+    words      uint16 number of words on the board
+    score      uint32 total score of the words (length squared, as in BoggleEngine)
+    longest    uint8 length of the longest word
+    byLength   uint16 (n, lengths) words of every length (WordsByLength) from 2 letters,
+               the last column holds the longer words too
+ReadRowGroups reads it back (only the requested columns are decompressed).
+
+Usage:
+    python boggle_analytics.py BOARDS [-o boards.bgs] [-r ROWS] [-c COLS] [-w WORKERS] [--seed SEED]
+"""
+import struct
+import zlib
+from collections import Counter,deque
+import multiprocessing as mp
+import numpy as np
+from boggle_dict import TILES,TILE_CODES
+from boggle_solver import FindAllWords,WordsByLength
+from boggle_engine import RandomBoards
+
+MAGIC = b'BGST'
+VERSION = 1
+HEADER = struct.Struct('<4sHHHH') # magic, version, rows, cols, length columns
+GROUP = struct.Struct('<I') # boards in the row group
+COLUMN = struct.Struct('<I') # compressed size of a column
+MIN_LENGTH = 2 # Shortest word of the byLength columns (and of the dictionary)
+
+def Columns(rows,cols,lengths):
+    """ List of (name, dtype, shape of a row) of the columns of the file """
+    return [('board',np.uint8,(rows*cols,)),
+            ('words',np.uint16,()),
+            ('score',np.uint32,()),
+            ('longest',np.uint8,()),
+            ('byLength',np.uint16,(lengths,))]
+
+def LengthColumns(rows,cols):
+    """ Number of byLength columns, word lengths 2 .. rows*cols+1 (a path of all the cells with one QU tile) """
+    return rows*cols
+
+_worker = {} # Dictionary of the worker process (opened once by InitWorker)
+
+def InitWorker(boggleDict):
+    """ Pool initializer, a compiled dictionary is pickled as its path so every worker maps the same file """
+    _worker['dict'] = boggleDict
+
+def SolveChunk(job):
+    """
+    Generate and solve a chunk of boards, job is (seed, boards, rows, cols),
+    return (row group bytes, word count histogram, score histogram, words by length, Counter {word: boards})
+    """
+    seed,n,rows,cols = job
+    boggleDict = _worker['dict']
+    lengths = LengthColumns(rows,cols)
+    boards = RandomBoards(boggleDict,n,rows,cols,seed)
+    codes = np.array([TILE_CODES[tile] for tile in boards.ravel().tolist()],dtype=np.uint8).reshape(n,rows*cols)
+    words = np.zeros(n,dtype=np.uint16)
+    scores = np.zeros(n,dtype=np.uint32)
+    longest = np.zeros(n,dtype=np.uint8)
+    byLength = np.zeros((n,lengths),dtype=np.uint16)
+    wordBoards = Counter()
+    for number,board in enumerate(boards.tolist()):
+        wordSet = set(FindAllWords(board,boggleDict))
+        wordBoards.update(wordSet)
+        words[number] = len(wordSet)
+        scores[number] = sum(len(word)**2 for word in wordSet)
+        for length,count in WordsByLength(wordSet).items():
+            byLength[number,min(max(length-MIN_LENGTH,0),lengths-1)] += count
+            longest[number] = max(longest[number],length)
+    group = [GROUP.pack(n)]
+    for column in (codes,words,scores,longest,byLength):
+        data = zlib.compress(column.astype(column.dtype.newbyteorder('<'),copy=False).tobytes())
+        group.append(COLUMN.pack(len(data)))
+        group.append(data)
+    return (b''.join(group),np.bincount(words),np.bincount(scores),
+            byLength.sum(axis=0,dtype=np.int64),wordBoards)
+
+def AddHistogram(total,histogram):
+    """ Sum of two histograms of different lengths """
+    if len(histogram) > len(total):
+        total,histogram = histogram.astype(np.int64),total
+    total[:len(histogram)] += histogram
+    return total
+
+def HistogramPercentiles(histogram,percents):
+    """ Values at the given percents (0-100) of the samples counted by a histogram {value: count} """
+    cumulative = np.cumsum(histogram)
+    if not len(cumulative) or cumulative[-1] == 0:
+        return {percent: None for percent in percents}
+    return {percent: int(np.searchsorted(cumulative,cumulative[-1]*percent/100)) for percent in percents}
+
+class BoardStats():
+    """
+    Running totals over row groups (everything is bounded by the board size or the dictionary size)
+    """
+    def __init__(self,rows,cols):
+        self.boards = 0
+        self.wordCounts = np.zeros(1,dtype=np.int64) # Histogram of the number of words on a board
+        self.scores = np.zeros(1,dtype=np.int64) # Histogram of the board scores
+        self.byLength = np.zeros(LengthColumns(rows,cols),dtype=np.int64) # Words of every length on all the boards
+        self.wordBoards = Counter() # {word: number of boards it's on}
+
+    def Add(self,wordCounts,scores,byLength,wordBoards):
+        """ Add the histograms of a chunk (from SolveChunk) """
+        self.boards += int(wordCounts.sum())
+        self.wordCounts = AddHistogram(self.wordCounts,wordCounts)
+        self.scores = AddHistogram(self.scores,scores)
+        self.byLength += byLength
+        self.wordBoards.update(wordBoards)
+
+    def Summary(self,top=20,percents=(1,5,25,50,75,95,99)):
+        """ Dictionary of the final statistics (JSON serializable) """
+        boards = max(self.boards,1)
+        values = np.arange(len(self.wordCounts))
+        scoreValues = np.arange(len(self.scores))
+        lengths = {}
+        for column,count in enumerate(self.byLength.tolist()):
+            if count:
+                key = str(column+MIN_LENGTH) if column < len(self.byLength)-1 else '{}+'.format(column+MIN_LENGTH)
+                lengths[key] = count
+        return {'boards':self.boards,
+                'meanWords':round(float((values*self.wordCounts).sum())/boards,3),
+                'wordPercentiles':HistogramPercentiles(self.wordCounts,percents),
+                'emptyBoards':int(self.wordCounts[0]),
+                'meanScore':round(float((scoreValues*self.scores).sum())/boards,3),
+                'scorePercentiles':HistogramPercentiles(self.scores,percents),
+                'maxScore':int(np.flatnonzero(self.scores)[-1]) if self.boards else None,
+                'wordsByLength':lengths,
+                'distinctWords':len(self.wordBoards),
+                'topWords':[(word,count) for word,count in self.wordBoards.most_common(top)]}
+
+def ChunkJobs(boards,rows,cols,chunkSize,seed):
+    """ Generator of the SolveChunk jobs, chunk seeds are spawned from one seed sequence """
+    sequence = np.random.SeedSequence(seed)
+    for chunk,start in enumerate(range(0,boards,chunkSize)):
+        chunkSeed = np.random.SeedSequence(sequence.entropy,spawn_key=(chunk,))
+        yield (chunkSeed,min(chunkSize,boards-start),rows,cols)
+
+def AnalyzeBoards(boggleDict,boards,path,rows=4,cols=4,workers=None,chunkSize=1000,seed=None,progress=None):
+    """
+    Solve random boards in a process pool, write the columnar file and return the BoardStats,
+    progress is called with the number of boards done after every chunk
+    """
+    stats = BoardStats(rows,cols)
+    workers = workers or mp.cpu_count()
+    with open(path,'wb') as f, mp.Pool(workers,InitWorker,(boggleDict,)) as pool:
+        f.write(HEADER.pack(MAGIC,VERSION,rows,cols,LengthColumns(rows,cols)))
+        pending = deque()
+        jobs = ChunkJobs(boards,rows,cols,chunkSize,seed)
+        for job in jobs:
+            pending.append(pool.apply_async(SolveChunk,(job,)))
+            if len(pending) < 4*workers: # Keep every worker busy, but don't queue all the chunks
+                continue
+            group,*chunkStats = pending.popleft().get()
+            f.write(group)
+            stats.Add(*chunkStats)
+            if progress != None:
+                progress(stats.boards)
+        while pending:
+            group,*chunkStats = pending.popleft().get()
+            f.write(group)
+            stats.Add(*chunkStats)
+            if progress != None:
+                progress(stats.boards)
+    return stats
+
+def ReadRowGroups(path,columns=None):
+    """
+    Read a file of AnalyzeBoards, yield a dictionary {column name: numpy array} for every row group,
+    only the requested columns are decompressed (all of them if None)
+    """
+    with open(path,'rb') as f:
+        magic,version,rows,cols,lengths = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('Not a boggle statistics file (version {})'.format(VERSION))
+        schema = Columns(rows,cols,lengths)
+        while True:
+            data = f.read(GROUP.size)
+            if not data:
+                return
+            n, = GROUP.unpack(data)
+            group = {}
+            for name,dtype,shape in schema:
+                size, = COLUMN.unpack(f.read(COLUMN.size))
+                if columns != None and name not in columns:
+                    f.seek(size,1)
+                    continue
+                values = np.frombuffer(zlib.decompress(f.read(size)),dtype=np.dtype(dtype).newbyteorder('<'))
+                group[name] = values.astype(dtype,copy=False).reshape((n,)+shape)
+            yield group
+
+def DecodeBoard(codes,cols):
+    """ 2D list of tiles of a board row of the board column """
+    tiles = [TILES[code] for code in codes]
+    return [tiles[row:row+cols] for row in range(0,len(tiles),cols)]
+
+if __name__=="__main__":
+    import argparse
+    import json
+    import sys
+    import time
+    from boggle_dict import LoadBoggleDict
+    parser = argparse.ArgumentParser(description='Statistics of random boggle boards')
+    parser.add_argument('boards',type=int,help='number of boards')
+    parser.add_argument('-o','--output',default='boards.bgs',help='columnar file of all the boards')
+    parser.add_argument('-r','--rows',type=int,default=4)
+    parser.add_argument('-c','--cols',type=int,default=4)
+    parser.add_argument('-w','--workers',type=int,default=None,help='number of worker processes')
+    parser.add_argument('--chunk',type=int,default=1000,help='boards in a row group')
+    parser.add_argument('--top',type=int,default=20,help='number of most frequent words')
+    parser.add_argument('--dict',default=None,help='word list file (the default dictionary if not given)')
+    parser.add_argument('--seed',type=int,default=None)
+    parser.add_argument('--summary',default=None,help='also write the statistics to a JSON file')
+    args = parser.parse_args()
+    boggleDict = LoadBoggleDict(args.dict)
+    t0 = time.perf_counter()
+    def Progress(done):
+        sys.stderr.write('\r{} boards, {:.0f} boards/sec'.format(done,done/(time.perf_counter()-t0)))
+    stats = AnalyzeBoards(boggleDict,args.boards,args.output,args.rows,args.cols,args.workers,args.chunk,args.seed,Progress)
+    sys.stderr.write('\n')
+    summary = stats.Summary(args.top)
+    print(json.dumps(summary,indent=1))
+    if args.summary != None:
+        with open(args.summary,'w') as f:
+            json.dump(summary,f,indent=1)
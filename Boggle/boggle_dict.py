@@ -0,0 +1,383 @@
+"""
+Compiled boggle dictionary,
+a word list is compiled once into a minimized DAWG (directed acyclic word graph - a trie in which
+identical suffix trees are stored once) plus the letter counts of the dictionary.
+The DAWG is stored as flat arrays in a binary file which is memory mapped when loaded,
+so starting a game or a solver worker doesn't parse the word list, and all the processes which
+load the same file share one read only copy of it (through the OS page cache).
+The compiled file is kept next to the word list and rebuilt automatically when the word list changes.
+
+File layout (little endian):
+    header - magic, version, node count, edge count, word count, character count, source size, source mtime
+    letter counts - 26 unsigned long longs (A..Z, Q counts QU)
+    masks - node count unsigned ints, bit t is set if the node has an edge for tile t, bit 31 if it ends a word
+    first edges - node count unsigned ints, index of the node's first edge
+    edges - edge count unsigned ints, child node of every edge
+The edges of a node are consecutive (ordered by tile), so the edge for tile t is
+first edge + number of smaller tiles in the mask. Node 0 is the root.
+"""
+import os
+import string
+import struct
+import sys
+import mmap
+from array import array
+
+MAGIC = b'BGDT'
+VERSION = 2
+HEADER = struct.Struct('<4sHHIIIQQQ') # magic, version, padding, nodes, edges, words, characters, source size, source mtime
+COUNTS = struct.Struct('<26Q')
+WORD_BIT = 1 << 31
+TILES = list(string.ascii_uppercase)
+TILES[TILES.index('Q')] = 'QU'
+TILE_CODES = {tile: code for code,tile in enumerate(TILES)}
+DEFAULT_DICT = os.path.join('assets','usa.txt')
+
+def ReadWordList(path):
+    """
+    Read a word list file, keep only words made of 2 or more letters (Q only as QU), in upper case
+    """
+    with open(path, 'r') as f:
+        words = f.read().upper().split('\n')
+    upperAlphabet = set(string.ascii_uppercase)
+    boggleDict = []
+    for fixedWord in words:
+        if len(fixedWord)<2 or not upperAlphabet.issuperset(fixedWord):
+            continue
+        if ('Q' in fixedWord) and not ('QU' in fixedWord):
+            continue
+        boggleDict.append(fixedWord)
+    return boggleDict
+
+def WordTiles(word):
+    """
+    Split a word into board tiles, 'QU' is a single tile
+    e.g. QUEEN - QU,E,E,N
+    Return None if the word can't appear on a board (Q without U)
+    """
+    tiles = []
+    i = 0
+    while i < len(word):
+        if word[i] == 'Q':
+            if word[i+1:i+2] != 'U':
+                return None
+            tiles.append('QU')
+            i += 2
+        else:
+            tiles.append(word[i])
+            i += 1
+    return tiles
+
+def CountLetters(boggleDict):
+    """
+    Count the tiles in all the words of the dictionary (the U of QU isn't counted)
+    Return the counts {tile: count} and the total number of characters
+    """
+    counts = dict.fromkeys(string.ascii_uppercase,0)
+    characters = 0
+    for word in boggleDict:
+        characters += len(word)
+        for letter in word:
+            if letter != 'U':
+                counts[letter] += 1
+        counts['U'] += word.count('U')-word.count('QU')
+    counts['QU'] = counts.pop('Q')
+    return counts,characters
+
+class DawgNode():
+    """ Node of a DAWG under construction """
+    __slots__ = ('edges','final')
+    def __init__(self):
+        self.edges = {} # {tile code: child node}
+        self.final = False
+    def Signature(self):
+        """ Nodes with equal signatures have identical suffix trees (children are already unique) """
+        return (self.final,tuple((code,id(child)) for code,child in sorted(self.edges.items())))
+
+def BuildDawg(boggleDict):
+    """
+    Build a minimized DAWG of the words of a dictionary, incrementally from the sorted words
+    (Daciuk et al. 2000), only the path of the last word is ever left unminimized
+    so the memory used is about the size of the final DAWG
+    Return the root node and the number of (unique) words
+    """
+    words = sorted(set(tuple(TILE_CODES[tile] for tile in tiles) for tiles in map(WordTiles,boggleDict) if tiles != None))
+    register = {} # {signature: unique node}
+    unchecked = [] # (parent, tile code, child) of the last word's nodes which weren't minimized yet
+    def Minimize(depth):
+        while len(unchecked) > depth:
+            parent,code,child = unchecked.pop()
+            signature = child.Signature()
+            if signature in register:
+                parent.edges[code] = register[signature]
+            else:
+                register[signature] = child
+    root = DawgNode()
+    previous = ()
+    for word in words:
+        common = 0
+        while common < min(len(word),len(previous)) and word[common] == previous[common]:
+            common += 1
+        Minimize(common)
+        node = unchecked[-1][2] if unchecked else root
+        for code in word[common:]:
+            child = DawgNode()
+            node.edges[code] = child
+            unchecked.append((node,code,child))
+            node = child
+        node.final = True
+        previous = word
+    Minimize(0)
+    return root,len(words)
+
+def CompileDict(boggleDict,sourceSize=0,sourceMtime=0):
+    """
+    Compile a list of words into the binary dictionary format, return bytes
+    """
+    root,words = BuildDawg(boggleDict)
+    # Number the unique nodes in breadth first order, the root is node 0
+    numbers = {id(root):0}
+    queue = [root]
+    for node in queue: # The queue grows while it's iterated
+        for code in sorted(node.edges):
+            child = node.edges[code]
+            if id(child) not in numbers:
+                numbers[id(child)] = len(queue)
+                queue.append(child)
+    masks = array('I')
+    firstEdges = array('I')
+    edges = array('I')
+    for node in queue:
+        mask = WORD_BIT if node.final else 0
+        firstEdges.append(len(edges))
+        for code in sorted(node.edges):
+            mask |= 1 << code
+            edges.append(numbers[id(node.edges[code])])
+        masks.append(mask)
+    if sys.byteorder != 'little':
+        for values in (masks,firstEdges,edges):
+            values.byteswap()
+    counts,characters = CountLetters(boggleDict)
+    header = HEADER.pack(MAGIC,VERSION,0,len(masks),len(edges),words,characters,sourceSize,sourceMtime)
+    return header+COUNTS.pack(*[counts[tile] for tile in TILES])+masks.tobytes()+firstEdges.tobytes()+edges.tobytes()
+
+def CompiledPath(source):
+    """ Path of the compiled dictionary of a word list """
+    return os.path.splitext(source)[0]+'.bgd'
+
+def BuildDictFile(source,target=None):
+    """
+    Compile a word list file, the compiled file is written atomically
+    so other processes never load a partial file
+    """
+    if target == None:
+        target = CompiledPath(source)
+    info = os.stat(source)
+    data = CompileDict(ReadWordList(source),info.st_size,info.st_mtime_ns)
+    temporary = '{}.{}.tmp'.format(target,os.getpid())
+    with open(temporary,'wb') as f:
+        f.write(data)
+    os.replace(temporary,target)
+    return target
+
+class BoggleDict():
+    """
+    Read only dictionary over compiled data (bytes or a memory map),
+    it's iterated and checked (word in boggleDict) like the list from ImportBoggleDict,
+    and the solver walks its nodes directly (node 0 is the root).
+    A dictionary loaded from a file is pickled as its path, so worker processes map the same file
+    """
+    def __init__(self,data,path=None):
+        self.data = data
+        self.path = path
+        magic,version,_,self.nodeCount,self.edgeCount,self.wordCount,self.characters,self.sourceSize,self.sourceMtime = HEADER.unpack_from(data,0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('Not a compiled boggle dictionary (version {})'.format(VERSION))
+        self.letterCounts = dict(zip(TILES,COUNTS.unpack_from(data,HEADER.size)))
+        offset = HEADER.size+COUNTS.size
+        view = memoryview(data)
+        arrays = []
+        for length in (self.nodeCount,self.nodeCount,self.edgeCount):
+            values = view[offset:offset+4*length].cast('I')
+            if sys.byteorder != 'little': # Memory maps can't be swapped in place
+                values = array('I',values); values.byteswap()
+            arrays.append(values)
+            offset += 4*length
+        self.masks,self.firstEdges,self.edges = arrays
+        self.heights = None
+        self.edgeOffsets = None
+
+    def __reduce__(self):
+        if self.path != None:
+            return (OpenDictFile,(self.path,))
+        return (BoggleDict,(bytes(self.data),))
+
+    def Child(self,node,tile):
+        """ Child of a node for a tile, None if no word continues with this tile """
+        code = TILE_CODES.get(tile)
+        mask = self.masks[node]
+        if code == None or not mask >> code & 1:
+            return None
+        return self.edges[self.firstEdges[node]+(mask & ((1 << code)-1)).bit_count()]
+
+    def Children(self,node):
+        """ List of (tile, child node) of all the edges of a node """
+        mask = self.masks[node]
+        edge = self.firstEdges[node]
+        children = []
+        for code,tile in enumerate(TILES):
+            if mask >> code & 1:
+                children.append((tile,self.edges[edge]))
+                edge += 1
+        return children
+
+    def PostOrder(self):
+        """ List of all the nodes, every node comes after all of its children """
+        done = bytearray(self.nodeCount)
+        order = []
+        stack = [0]
+        while stack:
+            node = stack[-1]
+            pending = [child for tile,child in self.Children(node) if not done[child]]
+            if pending:
+                stack.extend(pending)
+                continue
+            stack.pop()
+            if not done[node]:
+                done[node] = 1
+                order.append(node)
+        return order
+
+    def Heights(self):
+        """
+        Longest word continuation (number of tiles) below every node,
+        computed on the first call (not stored in the file)
+        """
+        if self.heights == None:
+            heights = array('B',[0])*self.nodeCount
+            for node in self.PostOrder():
+                heights[node] = max((heights[child]+1 for tile,child in self.Children(node)),default=0)
+            self.heights = heights
+        return self.heights
+
+    def Index(self,word):
+        """
+        Position of a word in the alphabetical order of the dictionary (0 .. len-1), None if it isn't a word,
+        so a set of words can be kept as a compact array of numbers
+        """
+        if self.edgeOffsets == None:
+            # Words before every edge among the words of its node (the node's own word and the earlier edges)
+            counts = array('I',[0])*self.nodeCount
+            offsets = array('I',[0])*self.edgeCount
+            for node in self.PostOrder():
+                total = 1 if self.IsWord(node) else 0
+                edge = self.firstEdges[node]
+                for tile,child in self.Children(node):
+                    offsets[edge] = total
+                    total += counts[child]
+                    edge += 1
+                counts[node] = total
+            self.edgeOffsets = offsets
+        tiles = WordTiles(word)
+        if tiles == None:
+            return None
+        node = 0
+        index = 0
+        for tile in tiles:
+            code = TILE_CODES.get(tile)
+            mask = self.masks[node]
+            if code == None or not mask >> code & 1:
+                return None
+            edge = self.firstEdges[node]+(mask & ((1 << code)-1)).bit_count()
+            index += self.edgeOffsets[edge]
+            node = self.edges[edge]
+        if not self.IsWord(node):
+            return None
+        return index
+
+    def IsWord(self,node):
+        """ Check if the tiles leading to the node make a word """
+        return self.masks[node] & WORD_BIT != 0
+
+    def Find(self,word):
+        """ Node reached by the tiles of a word, None if no word starts with it """
+        tiles = WordTiles(word)
+        if tiles == None:
+            return None
+        node = 0
+        for tile in tiles:
+            node = self.Child(node,tile)
+            if node == None:
+                return None
+        return node
+
+    def Contains(self,word):
+        """ Check if the word is in the dictionary """
+        node = self.Find(word)
+        return node != None and self.IsWord(node)
+
+    def HasPrefix(self,prefix):
+        """ Check if any word in the dictionary starts with the prefix """
+        return self.Find(prefix) != None
+
+    def __contains__(self,word):
+        return self.Contains(word)
+
+    def __len__(self):
+        return self.wordCount
+
+    def __iter__(self):
+        """ Iterate the words in alphabetical order """
+        stack = [(0,'')]
+        while stack:
+            node,word = stack.pop()
+            if self.IsWord(node):
+                yield word
+            stack.extend((child,word+tile) for tile,child in reversed(self.Children(node)))
+
+_compiledCache = {'dict':None,'compiled':None}
+
+def AsBoggleDict(boggleDict):
+    """
+    Get the compiled version of a dictionary - a BoggleDict is returned as it is,
+    a list of words is compiled in memory only once (the last one is cached)
+    """
+    if isinstance(boggleDict,BoggleDict):
+        return boggleDict
+    if _compiledCache['dict'] is not boggleDict:
+        _compiledCache['compiled'] = BoggleDict(CompileDict(boggleDict))
+        _compiledCache['dict'] = boggleDict
+    return _compiledCache['compiled']
+
+def OpenDictFile(path):
+    """ Memory map a compiled dictionary file """
+    with open(path,'rb') as f:
+        data = mmap.mmap(f.fileno(),0,access=mmap.ACCESS_READ)
+    return BoggleDict(data,path)
+
+def LoadBoggleDict(file=None):
+    """
+    Load the compiled dictionary of a word list file,
+    it's compiled first if it doesn't exist, is of another version or the word list changed
+    """
+    source = DEFAULT_DICT if file==None else file
+    target = CompiledPath(source)
+    info = os.stat(source)
+    for attempt in range(2):
+        try:
+            boggleDict = OpenDictFile(target)
+            if (boggleDict.sourceSize,boggleDict.sourceMtime) == (info.st_size,info.st_mtime_ns):
+                return boggleDict
+        except (OSError,ValueError,struct.error):
+            pass
+        if attempt == 0:
+            try:
+                BuildDictFile(source,target)
+            except OSError: # Can't write next to the word list, compile in memory
+                return BoggleDict(CompileDict(ReadWordList(source),info.st_size,info.st_mtime_ns))
+    raise ValueError('Failed to compile {}'.format(source))
+
+if __name__=="__main__":
+    for source in sys.argv[1:] or [DEFAULT_DICT]:
+        target = BuildDictFile(source)
+        print('Compiled {} words from {} to {}'.format(len(LoadBoggleDict(source)),source,target))
@@ -1,7 +1,11 @@
 # boggle game
-from time import time
-import random, string
+from time import monotonic
+from math import ceil
+import queue, threading
+import numpy as np
 from numpy.random import choice
+from boggle_dict import BoggleDict,LoadBoggleDict,ReadWordList,CountLetters,DEFAULT_DICT
+from boggle_solver import FindAllWords,WordsByLength
 def PrintBoard(board):
     """
     Print out the board directly to the console.
@@ -12,81 +16,93 @@ def PrintBoard(board):
             print(board[row][col],end=' | ')
         print('')
         
+_frequencyCache = {'dict':None,'model':None}
+
 def GetLetterFrequencies(boggleDict):
     """
     Get freuqency of letters in given dictionary
     Results can be compared with:
     http://pi.math.cornell.edu/~mec/2003-2004/cryptography/subs/frequencies.html
+    The frequencies are computed once for every dictionary (the last one is cached)
     """
-    dictString = ''.join(boggleDict)
-    letterFrequency = {}
-    currentLetter = None
-    for i,letter in enumerate(dictString):
-        if currentLetter == 'QU':
-            if letter=='U': continue
-        if letter == 'Q': currentLetter = 'QU'
-        else: currentLetter = letter
-        if currentLetter not in letterFrequency:
-            letterFrequency[currentLetter]=0
+    if _frequencyCache['dict'] is not boggleDict:
+        if isinstance(boggleDict,BoggleDict): # Counted when the dictionary was compiled
+            counts,characters = boggleDict.letterCounts,boggleDict.characters
         else:
-            letterFrequency[currentLetter]+=1
+            counts,characters = CountLetters(boggleDict)
+        letterFrequency = {}
+        for letter,count in counts.items():
+            if count>0:
+                letterFrequency[letter] = round(count/characters,4)
+        remainder = 1-sum(letterFrequency.values())
+        letterFrequency['E'] = letterFrequency['E']+remainder
+        letterFrequency={k: v for k, v in sorted(letterFrequency.items(), key=lambda item: item[1],reverse=True)}
+        _frequencyCache['model'] = (list(letterFrequency.keys()),list(letterFrequency.values()))
+        _frequencyCache['dict'] = boggleDict
+    letters,frequencies = _frequencyCache['model']
+    return list(letters),list(frequencies)
 
-    for key,value in letterFrequency.items():
-        letterFrequency[key] = round(value/len(dictString),4)
-    remainder = 1-sum(letterFrequency.values())
-    letterFrequency['E'] = letterFrequency['E']+remainder
-    letterFrequency={k: v for k, v in sorted(letterFrequency.items(), key=lambda item: item[1],reverse=True)}
-    frequencies = list(letterFrequency.values())
-    letters = list(letterFrequency.keys())
-    return letters,frequencies
 
+def RandomBoard(boggleDict,rows=4,cols=4):
+    """
+    Create a 2D list of random characters (rows x cols boggle board)
+    """
+    letters,frequencies = GetLetterFrequencies(boggleDict)
+    return choice(letters,size=(rows,cols),p=frequencies).tolist()
 
-def RandomBoard(boggleDict):
+def RandomBoards(boggleDict,n,rows=4,cols=4,seed=None):
     """
-    Create a 2D list of random characters (boggle board)
+    Create n random boards in a single draw, return an (n, rows, cols) array of characters,
+    the same seed always gives the same boards
     """
-    
     letters,frequencies = GetLetterFrequencies(boggleDict)
-    
-    board = []
-    for r in range(4):
-        board.append([])
-        for c in range(4):
-            randomLetter = choice(letters,p=frequencies)
-            board[r].append(randomLetter)
-    return board
+    generator = np.random.default_rng(seed)
+    indices = generator.choice(len(letters),size=(n,rows,cols),p=frequencies)
+    return np.array(letters)[indices]
 
 def ImportBoggleDict(file = None):
     """
     Import a dictionary of words
     words.txt from https://github.com/dwyl/english-words/blob/master/words.txt
     usa.txt from http://www.gwicks.net/dictionaries.htm
+    (LoadBoggleDict loads the compiled version of the dictionary, which is much faster)
     """
     if file==None:
-        path = 'assets\\usa.txt'
+        path = DEFAULT_DICT
     else:
         path = file
-    f = open(path, 'r')
-    words = f.readlines()
-    f.close()
-    boggleDict=[]
-    upperAlphabet = string.ascii_uppercase
-    for word in words:
-        badWord = False
-        fixedWord = word.rstrip('\n').upper()
-        for letter in fixedWord:
-            if letter not in upperAlphabet:
-                badWord = True
-        if ('Q' in fixedWord) and not ('QU' in fixedWord) or len(fixedWord)<2:
-            badWord = True
-        if badWord:
-            continue
-        else:
-            boggleDict.append(fixedWord)
-    return boggleDict
+    return ReadWordList(path)
 
 
 
+class BoardPrefetcher():
+    """
+    Keep a small queue of random boards which are already solved,
+    a background thread refills the queue (between games) so a new game never waits for a board
+    """
+    def __init__(self,boggleDict,rows=4,cols=4,size=3):
+        self.boggleDict = boggleDict
+        self.rows = rows
+        self.cols = cols
+        self.boards = queue.Queue(maxsize=size)
+        self.thread = threading.Thread(target=self.Fill,daemon=True)
+        self.thread.start()
+    def NewBoard(self):
+        """ Create a random board and solve it, return (board, word list) """
+        board = RandomBoard(self.boggleDict,self.rows,self.cols)
+        return board,FindAllWords(board,self.boggleDict)
+    def Fill(self):
+        """ Background thread, put is blocked while the queue is full """
+        while True:
+            self.boards.put(self.NewBoard())
+    def Get(self):
+        """ Pop a solved board, (board, word list) """
+        try:
+            return self.boards.get_nowait()
+        except queue.Empty: # The thread didn't catch up yet
+            return self.NewBoard()
+
+
 class BoggleEngine():
     """
     The main engine class for the boggle game, it allows the player to
@@ -94,20 +110,33 @@ class BoggleEngine():
     collects words and checks for valid words,
     keeps score,
     keeps game time
+    The board is solved once when the engine is created (unless the word list is given),
+    so checking words is done against the set of all the words on the board
     """
-    def __init__(self,board,boggleDict,gameTime):
+    def __init__(self,board,boggleDict,gameTime,wordList=None):
         self.board = board
-        self.t0 = time() # Time at creation of class
+        self.t0 = monotonic() # Time at creation of class
+        self.deadline = self.t0+gameTime
         self.timeLeft=1 # This prevents the game from ending before timers is updated
         self.gameTime = gameTime
         self.boggleDict = boggleDict
         self.score=0
         self.foundWords = []
+        self.foundSet = set()
+        if wordList == None:
+            wordList = FindAllWords(board,boggleDict)
+        self.solution = set(wordList) # All the words on the board
+        self.wordsByLength = WordsByLength(self.solution)
+        self.remainingByLength = dict(self.wordsByLength) # Words not found yet {length: count}
         self.gameOver = False
         self.ResetPicks()
     def Timer(self):
-        """ Keep remaimng game time """
-        self.timeLeft = self.gameTime-round((time()-self.t0))
+        """ Keep remaimng game time (whole seconds, it reaches 0 exactly at the deadline) """
+        self.timeLeft = max(ceil(self.SecondsLeft()),0)
+
+    def SecondsLeft(self):
+        """ Exact remaining game time in seconds (negative after the deadline) """
+        return self.deadline-monotonic()
         
     def ResetPicks(self):
         """ Reset the picked cells and collected word """
@@ -117,11 +146,13 @@ class BoggleEngine():
     def CheckWord(self):
         """ Check if the current word appears in the dictionary
             and hasn't been already found by the player"""
-        validWord = self.ValidWord(self.word,self.boggleDict)
-        wordIsNew = self.word not in self.foundWords
+        validWord = self.ValidWord(self.word)
+        wordIsNew = self.word not in self.foundSet
         if validWord and wordIsNew:
             self.score+= len(self.word)**2
             self.foundWords.append(self.word)
+            self.foundSet.add(self.word)
+            self.remainingByLength[len(self.word)]-=1
         self.ResetPicks()
         return validWord,wordIsNew
     def CollectWord(self,row,col):
@@ -138,30 +169,19 @@ class BoggleEngine():
             self.word += currentLetter
             self.lastPicked = currentCell
         return valid
-    def ValidWord(self,word,boggleDict):
+    def ValidWord(self,word):
         """
-        Check if the word appears in the dictionary
+        Check if the word appears in the dictionary (collected words are always on the board,
+        so it's enough to check the board's solution)
         """
         fixedWord = word.upper() #Transform word to the format given in the dictionary
-        if fixedWord in boggleDict:
-            return True
-        return False
-        
-    def Dist(self,x1,x2):
-        """
-        Calculate the euclidean distance between two points
-        """
-        d = ( (x2[0]-x1[0])**2+(x2[1]-x1[1])**2 )**(1/2)
-        return d
+        return fixedWord in self.solution
 
     def CheckIfNeighbor(self,x1,x2):
         """
         Check whether 2 points are neighbors on the boggle grid
         """
-        if self.Dist(x1,x2) <2:
-            return True
-        else:
-            return False
+        return abs(x2[0]-x1[0])<=1 and abs(x2[1]-x1[1])<=1 # Same as a distance below 2 for whole cells
 
 
 def PlayWithoutGUI(boggleGame):
@@ -201,7 +221,7 @@ def PlayWithoutGUI(boggleGame):
 if __name__=='__main__':
     # This part runs a boggle game from the engine, which can be played without the GUI
 
-    boggleDict = ImportBoggleDict()
+    boggleDict = LoadBoggleDict()
     board = RandomBoard(boggleDict)
     PrintBoard(board)
 
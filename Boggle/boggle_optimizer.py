@@ -0,0 +1,216 @@
+"""
+Boggle board optimiser,
+search for boards with the highest total score (or the most words) with simulated annealing
+over single cell letter changes (a temperature of 0 is plain hill climbing).
+Every word is kept with the number of board paths which spell it, so when a cell changes
+only the paths which pass through that cell are explored again:
+the path prefixes which lead into a cell don't depend on the cell's own letter, so they're found once
+(pruned when the cell is further than the longest continuation of the dictionary node) and kept
+until the board changes, and every letter proposed for the cell only continues these prefixes.
+Independent restarts run in parallel worker processes.
+"""
+import math
+import random
+import multiprocessing as mp
+from boggle_dict import AsBoggleDict,TILE_CODES,WORD_BIT
+from boggle_solver import NeighborTable
+from boggle_engine import GetLetterFrequencies
+
+_distanceCache = {} # {(rows,cols): distance table}
+
+def DistanceTable(rows,cols):
+    """
+    Chebyshev distance (number of king moves) between every two cells of a rows x cols board,
+    tables are computed once for every board size
+    """
+    if (rows,cols) not in _distanceCache:
+        cells = [divmod(cell,cols) for cell in range(rows*cols)]
+        _distanceCache[(rows,cols)] = [[max(abs(r1-r2),abs(c1-c2)) for r2,c2 in cells] for r1,c1 in cells]
+    return _distanceCache[(rows,cols)]
+
+def WordValue(word,metric):
+    """ Value of a word on the board, 'score' - length squared (as in BoggleEngine), 'words' - 1 """
+    if metric == 'words':
+        return 1
+    return len(word)**2
+
+class BoardScorer():
+    """
+    Score of a board which is updated incrementally when a single cell is changed
+    """
+    def __init__(self,board,boggleDict,metric='score'):
+        self.dawg = AsBoggleDict(boggleDict)
+        self.heights = self.dawg.Heights()
+        self.rows = len(board)
+        self.cols = len(board[0])
+        self.neighbors = NeighborTable(self.rows,self.cols)
+        self.distances = DistanceTable(self.rows,self.cols)
+        self.metric = metric
+        self.tiles = [tile for row in board for tile in row]
+        self.codes = [TILE_CODES[tile] for tile in self.tiles]
+        self.pathCounts = self.Paths(None) # {word: number of board paths}
+        self.score = sum(WordValue(word,metric) for word in self.pathCounts)
+        self.through = {} # {cell: paths through the cell} of the current board
+        self.frontiers = {} # {cell: DFS states leading into the cell} of the current board
+
+    def Board(self):
+        """ 2D list of the current board """
+        return [self.tiles[row*self.cols:(row+1)*self.cols] for row in range(self.rows)]
+
+    def Paths(self,target):
+        """ Count the words of all the board paths which pass through the target cell (all the paths if None) """
+        counts = {}
+        if target == None:
+            for cell in range(len(self.tiles)):
+                self.Explore(0,cell,0,'',counts)
+        else:
+            for node,visited,word in self.Frontier(target):
+                self.Explore(node,target,visited,word,counts)
+        return counts
+
+    def Explore(self,node,cell,visited,word,counts):
+        """ Board DFS from a cell (like boggle_solver.FindWords), counting the words of all the paths """
+        dawg = self.dawg
+        code = self.codes[cell]
+        mask = dawg.masks[node]
+        if not mask >> code & 1:
+            return
+        node = dawg.edges[dawg.firstEdges[node]+(mask & ((1 << code)-1)).bit_count()]
+        word = word+self.tiles[cell]
+        if dawg.masks[node] & WORD_BIT:
+            counts[word] = counts.get(word,0)+1
+        visited |= 1 << cell
+        for nextCell in self.neighbors[cell]:
+            if not visited >> nextCell & 1:
+                self.Explore(node,nextCell,visited,word,counts)
+
+    def Frontier(self,target):
+        """
+        DFS states (dawg node, visited, word) of all the path prefixes which continue into the target cell,
+        they don't depend on the target's letter (cached until the board changes)
+        """
+        if target not in self.frontiers:
+            frontier = [(0,0,'')] # Paths which start at the target
+            for cell in range(len(self.tiles)):
+                if cell != target:
+                    self.Prefixes(0,cell,0,'',target,frontier)
+            self.frontiers[target] = frontier
+        return self.frontiers[target]
+
+    def Prefixes(self,node,cell,visited,word,target,frontier):
+        """ Board DFS which doesn't enter the target cell, collects the states next to it """
+        dawg = self.dawg
+        code = self.codes[cell]
+        mask = dawg.masks[node]
+        if not mask >> code & 1:
+            return
+        node = dawg.edges[dawg.firstEdges[node]+(mask & ((1 << code)-1)).bit_count()]
+        if self.distances[cell][target] > self.heights[node]: # No word is long enough to reach the target
+            return
+        word = word+self.tiles[cell]
+        visited |= 1 << cell
+        for nextCell in self.neighbors[cell]:
+            if nextCell == target:
+                frontier.append((node,visited,word))
+            elif not visited >> nextCell & 1:
+                self.Prefixes(node,nextCell,visited,word,target,frontier)
+
+    def Through(self,cell):
+        """ Paths through a cell of the current board (cached until the board changes) """
+        if cell not in self.through:
+            self.through[cell] = self.Paths(cell)
+        return self.through[cell]
+
+    def Propose(self,cell,tile):
+        """
+        Score change if the cell's tile is replaced, return (delta, paths removed, paths added)
+        """
+        removed = self.Through(cell)
+        oldTile = self.tiles[cell]
+        self.tiles[cell] = tile; self.codes[cell] = TILE_CODES[tile]
+        added = self.Paths(cell)
+        self.tiles[cell] = oldTile; self.codes[cell] = TILE_CODES[oldTile]
+        delta = 0
+        for word in removed.keys() | added.keys():
+            before = self.pathCounts.get(word,0)
+            after = before-removed.get(word,0)+added.get(word,0)
+            if before and not after:
+                delta -= WordValue(word,self.metric)
+            elif after and not before:
+                delta += WordValue(word,self.metric)
+        return delta,removed,added
+
+    def Apply(self,cell,tile,delta,removed,added):
+        """ Change the cell's tile, with the result of Propose """
+        pathCounts = self.pathCounts
+        for word,count in removed.items():
+            pathCounts[word] -= count
+            if not pathCounts[word]:
+                del pathCounts[word]
+        for word,count in added.items():
+            pathCounts[word] = pathCounts.get(word,0)+count
+        self.tiles[cell] = tile; self.codes[cell] = TILE_CODES[tile]
+        self.score += delta
+        self.through = {}
+        self.frontiers = {}
+
+def OptimizeBoard(boggleDict,rows=4,cols=4,steps=2000,temperature=10.0,metric='score',seed=None):
+    """
+    Simulated annealing from a random board, the temperature cools geometrically to 1% of its start
+    Letters are drawn with the frequencies of the dictionary (GetLetterFrequencies)
+    Return (best score, best board)
+    """
+    generator = random.Random(seed)
+    letters,frequencies = GetLetterFrequencies(boggleDict)
+    tiles = generator.choices(letters,frequencies,k=rows*cols)
+    scorer = BoardScorer([tiles[row*cols:(row+1)*cols] for row in range(rows)],boggleDict,metric)
+    best = (scorer.score,scorer.Board())
+    cooling = 0.01**(1/max(steps,1))
+    for step in range(steps):
+        cell = generator.randrange(rows*cols)
+        tile = generator.choices(letters,frequencies)[0]
+        if tile == scorer.tiles[cell]:
+            continue
+        delta,removed,added = scorer.Propose(cell,tile)
+        if delta >= 0 or (temperature > 0 and generator.random() < math.exp(delta/temperature)):
+            scorer.Apply(cell,tile,delta,removed,added)
+            if scorer.score > best[0]:
+                best = (scorer.score,scorer.Board())
+        temperature *= cooling
+    return best
+
+def OptimizeArguments(arguments):
+    """ Pool helper, arguments is a (boggleDict, options) couple """
+    boggleDict,options = arguments
+    return OptimizeBoard(boggleDict,**options)
+
+def FindBestBoards(boggleDict,restarts=8,workers=None,seed=None,**options):
+    """
+    Run independent OptimizeBoard restarts in parallel (options are passed to OptimizeBoard),
+    return a list of (score, board) of all the restarts, best first
+    """
+    seeds = random.Random(seed).sample(range(2**31),restarts)
+    jobs = [(boggleDict,dict(options,seed=restartSeed)) for restartSeed in seeds]
+    with mp.Pool(workers) as pool:
+        results = pool.map(OptimizeArguments,jobs)
+    return sorted(results,key=lambda result: result[0],reverse=True)
+
+if __name__=="__main__":
+    import argparse
+    import boggle_engine as bg
+    parser = argparse.ArgumentParser(description='Search for high scoring boggle boards')
+    parser.add_argument('-r','--rows',type=int,default=4)
+    parser.add_argument('-c','--cols',type=int,default=4)
+    parser.add_argument('-s','--steps',type=int,default=2000,help='letter changes tried in every restart')
+    parser.add_argument('-n','--restarts',type=int,default=8)
+    parser.add_argument('-w','--workers',type=int,default=None,help='number of worker processes')
+    parser.add_argument('-t','--temperature',type=float,default=10.0,help='0 for hill climbing')
+    parser.add_argument('-m','--metric',default='score',choices=['score','words'])
+    parser.add_argument('--seed',type=int,default=None)
+    args = parser.parse_args()
+    boggleDict = bg.LoadBoggleDict()
+    results = FindBestBoards(boggleDict,args.restarts,args.workers,args.seed,rows=args.rows,cols=args.cols,
+                             steps=args.steps,temperature=args.temperature,metric=args.metric)
+    score,board = results[0]
+    bg.PrintBoard(board)
+    print('{}: {}'.format(args.metric,score))
@@ -0,0 +1,282 @@
+"""
+Multiplayer boggle game server (asyncio, single thread),
+every room has its own board, clock and players, and all the rooms share one read only
+dictionary (the memory mapped DAWG) and one cache of board solutions.
+A solution is kept as a sorted array of dictionary word indices (BoggleDict.Index), so a room
+holds only its board, its players' scores and found word indices - a few KB.
+The end of a game is a timer scheduled on the event loop (nothing is polled).
+
+Protocol - one JSON message per line:
+    {"op": "join", "room": name, "player": name}
+        -> {"op": "joined", "room": name, "board": [[...]], "timeLeft": seconds}
+        the room is created (with a new random board and a running clock) if it doesn't exist
+    {"op": "word", "word": "cat"}
+        -> {"op": "word", "word": "CAT", "valid": true, "new": true, "score": 9}
+    {"op": "leave"}
+        -> {"op": "left", "room": name}
+    when the room's time is up every player gets {"op": "end", "room": name, "scores": {player: score}}
+    bad messages (and words sent after the room's time is up) get {"op": "error", "error": description}
+
+Usage:
+    python boggle_server.py [--host HOST] [--port PORT] [--time SECONDS]
+    python boggle_server.py --bench ROOMS - play ROOMS rooms with local clients and report throughput
+"""
+import asyncio
+import json
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+import boggle_engine as bg
+from boggle_dict import AsBoggleDict
+from boggle_solver import FindAllWords
+
+class SolutionCache():
+    """
+    Least recently used {board: sorted array of the indices of all the words on the board},
+    shared by all the rooms
+    """
+    def __init__(self,boggleDict,size=4096):
+        self.boggleDict = boggleDict
+        self.size = size
+        self.solutions = OrderedDict()
+    def Get(self,board):
+        key = tuple(tile for row in board for tile in row)
+        solution = self.solutions.get(key)
+        if solution == None:
+            words = set(FindAllWords(board,self.boggleDict))
+            solution = array('I',sorted(self.boggleDict.Index(word) for word in words))
+            self.solutions[key] = solution
+            if len(self.solutions) > self.size:
+                self.solutions.popitem(last=False)
+        else:
+            self.solutions.move_to_end(key)
+        return solution
+
+class Player():
+    """ Score and found words (dictionary indices) of a player in a room """
+    __slots__ = ('name','connection','score','found')
+    def __init__(self,name,connection):
+        self.name = name
+        self.connection = connection
+        self.score = 0
+        self.found = set()
+
+class Room():
+    """ A game - board, solution, players and the timer which ends it """
+    __slots__ = ('name','board','solution','players','deadline','timer')
+    def __init__(self,name,board,solution,deadline):
+        self.name = name
+        self.board = board
+        self.solution = solution
+        self.players = {}
+        self.deadline = deadline
+        self.timer = None
+
+class BoggleServer():
+    """
+    Game logic of all the rooms, independent of the transport:
+    a connection is any object with a Send(message) method (and room and player attributes,
+    which the server sets while the connection is in a room)
+    """
+    def __init__(self,boggleDict,gameTime=180,rows=4,cols=4,cacheSize=4096):
+        self.boggleDict = AsBoggleDict(boggleDict) # Word lists are compiled, the solution cache needs Index
+        self.gameTime = gameTime
+        self.rows = rows
+        self.cols = cols
+        self.solutions = SolutionCache(self.boggleDict,cacheSize)
+        self.rooms = {}
+        self.submissions = 0
+
+    def Handle(self,connection,message):
+        """ Handle a client message, return the reply """
+        op = message.get('op') if isinstance(message,dict) else None
+        if op == 'word':
+            return self.Submit(connection,message.get('word'))
+        if op == 'join':
+            return self.Join(connection,message.get('room'),message.get('player'))
+        if op == 'leave':
+            return self.Leave(connection)
+        return {'op':'error','error':'unknown op {}'.format(op)}
+
+    def Join(self,connection,roomName,playerName,board=None):
+        """ Add a player to a room, the room is created if it doesn't exist """
+        if not isinstance(roomName,str) or not isinstance(playerName,str):
+            return {'op':'error','error':'join needs room and player names'}
+        room = self.rooms.get(roomName)
+        player = room.players.get(playerName) if room != None else None
+        if player != None and player.connection is not connection: # Checked before the current room is left
+            return {'op':'error','error':'{} is already in {}'.format(playerName,roomName)}
+        if connection.room != None:
+            self.Leave(connection)
+        loop = asyncio.get_running_loop()
+        room = self.rooms.get(roomName) # Leaving may have closed it
+        if room == None:
+            if board == None:
+                board = bg.RandomBoard(self.boggleDict,self.rows,self.cols)
+            room = Room(roomName,board,self.solutions.Get(board),loop.time()+self.gameTime)
+            room.timer = loop.call_later(self.gameTime,self.EndRoom,room)
+            self.rooms[roomName] = room
+        player = Player(playerName,connection)
+        room.players[playerName] = player
+        connection.room = room
+        connection.player = player
+        return {'op':'joined','room':roomName,'board':room.board,'timeLeft':round(room.deadline-loop.time())}
+
+    def Submit(self,connection,word):
+        """ Check a word (like BoggleEngine.CheckWord) and score it """
+        room = connection.room
+        if room == None:
+            return {'op':'error','error':'not in a room'}
+        if not isinstance(word,str):
+            return {'op':'error','error':'word must be a string'}
+        if asyncio.get_running_loop().time() >= room.deadline: # The end of game timer hasn't run yet
+            return {'op':'error','error':'time is up in {}'.format(room.name)}
+        self.submissions += 1
+        player = connection.player
+        word = word.upper()
+        index = self.boggleDict.Index(word)
+        solution = room.solution
+        position = bisect_left(solution,index) if index != None else len(solution)
+        valid = position < len(solution) and solution[position] == index
+        new = valid and index not in player.found
+        if new:
+            player.found.add(index)
+            player.score += len(word)**2
+        return {'op':'word','word':word,'valid':valid,'new':new,'score':player.score}
+
+    def Leave(self,connection):
+        """ Remove the connection's player from its room, an empty room is closed """
+        room = connection.room
+        if room == None:
+            return {'op':'error','error':'not in a room'}
+        room.players.pop(connection.player.name,None)
+        connection.room = None
+        connection.player = None
+        if not room.players:
+            room.timer.cancel()
+            self.rooms.pop(room.name,None)
+        return {'op':'left','room':room.name}
+
+    def EndRoom(self,room):
+        """ Timer callback at the room's deadline, send the scores to all the players and close the room """
+        scores = {name: player.score for name,player in room.players.items()}
+        message = {'op':'end','room':room.name,'scores':scores}
+        for player in room.players.values():
+            player.connection.room = None
+            player.connection.player = None
+            player.connection.Send(message)
+        room.players.clear()
+        self.rooms.pop(room.name,None)
+
+    async def ServeClient(self,reader,writer):
+        """ TCP client handler for asyncio.start_server """
+        connection = StreamConnection(writer)
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError: # Longer than the stream limit, the line was dropped
+                    reply = {'op':'error','error':'message too long'}
+                else:
+                    if not line:
+                        break
+                    try:
+                        message = json.loads(line)
+                    except ValueError as e:
+                        reply = {'op':'error','error':'bad message: {}'.format(e)}
+                    else:
+                        reply = self.Handle(connection,message)
+                connection.Send(reply)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            if connection.room != None:
+                self.Leave(connection)
+            writer.close()
+
+    async def Serve(self,host='127.0.0.1',port=8765):
+        server = await asyncio.start_server(self.ServeClient,host,port)
+        async with server:
+            await server.serve_forever()
+
+class StreamConnection():
+    """ Connection of a TCP client """
+    __slots__ = ('writer','room','player')
+    def __init__(self,writer):
+        self.writer = writer
+        self.room = None
+        self.player = None
+    def Send(self,message):
+        self.writer.write((json.dumps(message)+'\n').encode())
+
+class LocalClient():
+    """
+    In process stand-in for a TCP client (for tests and benchmarks),
+    replies are returned directly and pushed messages are put in a queue
+    """
+    __slots__ = ('server','room','player','messages')
+    def __init__(self,server):
+        self.server = server
+        self.room = None
+        self.player = None
+        self.messages = asyncio.Queue()
+    def Send(self,message):
+        self.messages.put_nowait(message)
+    def Join(self,roomName,playerName):
+        return self.server.Handle(self,{'op':'join','room':roomName,'player':playerName})
+    def Submit(self,word):
+        return self.server.Handle(self,{'op':'word','word':word})
+    def Leave(self):
+        return self.server.Handle(self,{'op':'leave'})
+    async def NextMessage(self):
+        """ Wait for a message pushed by the server (e.g. the end of the game) """
+        return await self.messages.get()
+
+async def Benchmark(boggleDict,rooms,players=2,words=50,gameTime=1):
+    """ Play many rooms at once with local clients, print the throughput and memory per room """
+    import random
+    import time
+    import tracemalloc
+    server = BoggleServer(boggleDict,gameTime)
+    dictWords = random.sample(list(boggleDict),1000)
+    clients = [LocalClient(server) for number in range(rooms*players)]
+    t0 = time.perf_counter()
+    for number in range(rooms):
+        for name in range(players):
+            clients[number*players+name].Join('room{}'.format(number),'player{}'.format(name))
+    setupTime = time.perf_counter()-t0
+    tracemalloc.start()
+    for name,client in enumerate(clients[:players]): # Memory of one more room (with its solution)
+        client.Leave()
+        client.Join('extra','player{}'.format(name))
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # Half of the words are on the board
+    submissions = []
+    for client in clients:
+        onBoard = set(FindAllWords(client.room.board,boggleDict))
+        submissions.append(random.sample(sorted(onBoard),min(len(onBoard),words//2))+random.sample(dictWords,words//2))
+    t0 = time.perf_counter()
+    for client,clientWords in zip(clients,submissions):
+        for word in clientWords:
+            client.Submit(word)
+    submitTime = time.perf_counter()-t0
+    ends = await asyncio.gather(*[client.NextMessage() for client in clients])
+    print('{} rooms created in {:.2f} sec, {:.1f} KB per room (with its solution)'.format(rooms,setupTime,memory/1024))
+    print('{} words checked in {:.3f} sec ({:.0f} words/sec)'.format(server.submissions,submitTime,server.submissions/submitTime))
+    print('{} end of game messages, {} rooms left'.format(sum(end['op']=='end' for end in ends),len(server.rooms)))
+
+if __name__=="__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='Multiplayer boggle server')
+    parser.add_argument('--host',default='127.0.0.1')
+    parser.add_argument('--port',type=int,default=8765)
+    parser.add_argument('--time',type=int,default=180,help='game time in seconds')
+    parser.add_argument('--bench',type=int,default=None,metavar='ROOMS',help='run a local benchmark instead of serving')
+    args = parser.parse_args()
+    boggleDict = bg.LoadBoggleDict()
+    if args.bench:
+        asyncio.run(Benchmark(boggleDict,args.bench))
+    else:
+        asyncio.run(BoggleServer(boggleDict,args.time).Serve(args.host,args.port))
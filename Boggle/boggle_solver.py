@@ -1,62 +1,119 @@
-import boggle_engine as bg
+from boggle_dict import AsBoggleDict,WordTiles,TILE_CODES,WORD_BIT
 
 
-def Bogglable(word,alphabet):
+_neighborCache = {} # {(rows,cols): neighbor table}
+
+def NeighborTable(rows,cols):
     """
-    Check if it's possible to create a word from characters appearing on the board (bogglable words)
+    List of neighbor cell indices for every cell (index = row*cols+col) of a rows x cols board,
+    tables are computed once for every board size
     """
-    boggle = True
-    for letter in word:
-        if letter not in alphabet:
-            boggle = False
-    return boggle
+    if (rows,cols) not in _neighborCache:
+        neighbors = []
+        for i in range(rows):
+            for j in range(cols):
+                neighbors.append([row*cols+col for row in range(max(i-1,0),min(i+2,rows))
+                                  for col in range(max(j-1,0),min(j+2,cols)) if (row,col) != (i,j)])
+        _neighborCache[(rows,cols)] = neighbors
+    return _neighborCache[(rows,cols)]
 
-def MakeAlphabet(board):
+def FindWords(dawg,node,cell,visited,word,board,wordList):
     """
-    Create a set from letters appearing on board
+    Find all words in the dictionary DAWG from current cell,
+    node is the DAWG node of the letters picked so far (word),
+    visited is a bitmask of the picked cells (bit i is cell i),
+    board is (tiles, tile codes, neighbor table) of the flat board
     """
-    alphabet = ''
-    for b in board:
-        alphabet = alphabet+''.join(b)
-    return set(alphabet)
+    tiles,codes,neighbors = board
+    code = codes[cell]
+    mask = dawg.masks[node]
+    if not mask >> code & 1: # No word continues with this letter
+        return
+    node = dawg.edges[dawg.firstEdges[node]+(mask & ((1 << code)-1)).bit_count()]
+    word = word+tiles[cell]
+    if dawg.masks[node] & WORD_BIT:
+        wordList.append(word)
+    visited |= 1 << cell
+    for nextCell in neighbors[cell]:
+        if not visited >> nextCell & 1:
+            FindWords(dawg,node,nextCell,visited,word,board,wordList)
 
-def FindBogglable(board,boggleDict):
+def FindAllWords(board,boggleDict):
     """
-    Make a list only of bogglable words, and all prefixes for each word
-    e.g. word - PEANUT - prefixes - PE, PEA, PEAN, PEANU
+    Find all the words on the board (any rows x cols board)
     """
-    alphabet = MakeAlphabet(board)
-    bogglableWords = set(word for word in boggleDict if Bogglable(word,alphabet))
-    prefixes = set(word[:i] for word in bogglableWords for i in range(2, len(word)+1))
-    return bogglableWords,prefixes
+    dawg = AsBoggleDict(boggleDict)
+    neighbors = NeighborTable(len(board),len(board[0]))
+    tiles = [tile for row in board for tile in row]
+    flatBoard = (tiles,[TILE_CODES[tile] for tile in tiles],neighbors)
+    wordList = []
+    for cell in range(len(tiles)):
+        FindWords(dawg,0,cell,0,'',flatBoard,wordList)
+    return wordList
 
-def FindWords(word,path,i,j,wordList,words,prefixes,board):
+def PathEnds(wordTiles,tiles,neighbors,memo,dawg):
     """
-    Find all words in dictionary from current cell
+    Find the ends of all the legal board paths which spell a word (list of tiles),
+    the DAWG is walked along with the board so the search stops at the first prefix no word starts with,
+    return (DAWG node of the word, set of (last cell, visited bitmask)) - the set is empty if the word
+    isn't on the board or no word starts with it,
+    memo {prefix: (node, path ends)} is shared by a batch of words so common prefixes are searched once
     """
-    rows = len(board); cols = len(board[0])
-    word = word + board[i][j]
-    path.append((i,j))
-    if word in words:
-        wordList.append(word)
-    if word in prefixes or len(word)==1:
-        for row in range(i-1,i+2):
-            for col in range(j-1,j+2):
-                if rows>row>=0 and cols>col>=0 and (row,col) not in path:
-                    FindWords(word,path,row,col,wordList,words,prefixes,board)
-    path.remove((i,j))
-    word = word[:-1]
+    node = 0
+    ends = None
+    prefix = ''
+    for tile in wordTiles:
+        prefix += tile
+        known = memo.get(prefix)
+        if known == None:
+            child = dawg.Child(node,tile)
+            if child == None: # Not a prefix of any word, the board isn't searched
+                known = (None,set())
+            elif ends == None: # First tile
+                known = (child,set((cell,1 << cell) for cell in range(len(tiles)) if tiles[cell] == tile))
+            else:
+                nextEnds = set()
+                for cell,visited in ends:
+                    for nextCell in neighbors[cell]:
+                        if tiles[nextCell] == tile and not visited >> nextCell & 1:
+                            nextEnds.add((nextCell,visited | 1 << nextCell))
+                known = (child,nextEnds)
+            memo[prefix] = known
+        node,ends = known
+        if not ends: # No longer word can be on the board either
+            break
+    return node,ends
 
-def FindAllWords(board,boggleDict):
+def ValidWords(board,boggleDict,words):
     """
-    Find all the words on the board
+    Check a batch of typed words, return the set of words (upper case) which are
+    in the dictionary and can be picked on the board with a legal path
     """
-    words,prefixes = FindBogglable(board,boggleDict)
-    wordList = []
-    for iStart in range(4):
-        for jStart in range(4):
-            FindWords('',[],iStart,jStart,wordList,words,prefixes,board)
-    return wordList
+    dawg = AsBoggleDict(boggleDict)
+    neighbors = NeighborTable(len(board),len(board[0]))
+    tiles = [tile for row in board for tile in row]
+    memo = {}
+    valid = set()
+    for word in set(word.upper() for word in words):
+        tileList = WordTiles(word)
+        if not tileList:
+            continue
+        node,ends = PathEnds(tileList,tiles,neighbors,memo,dawg)
+        if ends and dawg.IsWord(node):
+            valid.add(word)
+    return valid
+
+def ScoreWords(board,boggleDict,submissions):
+    """
+    Score the words typed by many players on the same board,
+    submissions is {player: list of words}, return {player: score},
+    every valid word scores its length squared once for each player (like BoggleEngine)
+    """
+    valid = ValidWords(board,boggleDict,(word for words in submissions.values() for word in words))
+    scores = {}
+    for player,words in submissions.items():
+        scores[player] = sum(len(word)**2 for word in set(word.upper() for word in words) if word in valid)
+    return scores
 
 def WordsByLength(wordList):
     """
@@ -74,8 +131,9 @@ def WordsByLength(wordList):
 
             
 if __name__=="__main__":   
-    boggleDict = bg.ImportBoggleDict()
-    board = bg.RandomBoard()
+    import boggle_engine as bg # The engine imports the solver
+    boggleDict = bg.LoadBoggleDict()
+    board = bg.RandomBoard(boggleDict)
 
     bg.PrintBoard(board)
     wordList = FindAllWords(board,boggleDict)
@@ -0,0 +1,112 @@
+"""
+Tests of the boggle dictionary, solver, optimizer and server, run with pytest from this directory
+"""
+import asyncio
+import os
+import random
+import struct
+import pytest
+from boggle_dict import MAGIC,VERSION,ReadWordList,CompiledPath,OpenDictFile,LoadBoggleDict
+from boggle_solver import ValidWords,ScoreWords,FindAllWords
+from boggle_optimizer import BoardScorer
+from boggle_server import BoggleServer,LocalClient
+
+WORDS = ['QUIT','QUITE','EAT','SAT','TEA','EEL']
+BOARD = [['QU','I','T'],
+         ['E','A','S'],
+         ['R','O','N']]
+
+def WriteWordList(path,words):
+    path.write_text('\n'.join(words)+'\n')
+    return str(path)
+
+def test_DictFile(tmp_path):
+    source = WriteWordList(tmp_path/'words.txt',['cat','Car','cart','car','a','quit','qat','quits','zebra',"it's",'zoo','cab'])
+    words = sorted(set(ReadWordList(source)))
+    boggleDict = LoadBoggleDict(source)
+    assert boggleDict.path == CompiledPath(source)
+    assert list(boggleDict) == words and len(boggleDict) == len(words)
+    assert all(word in boggleDict for word in words)
+    assert not any(word in boggleDict for word in ['CA','CARTS','QAT','A',''])
+    assert [boggleDict.Index(word) for word in words] == list(range(len(words)))
+    assert boggleDict.Index('CA') == None and boggleDict.Index('QAT') == None
+
+def test_DictFileRebuilds(tmp_path):
+    source = WriteWordList(tmp_path/'words.txt',['cat','dog'])
+    assert list(LoadBoggleDict(source)) == ['CAT','DOG']
+    WriteWordList(tmp_path/'words.txt',['cat','dog','eel']) # Size changed
+    assert list(LoadBoggleDict(source)) == ['CAT','DOG','EEL']
+    mtime = os.stat(source).st_mtime_ns
+    WriteWordList(tmp_path/'words.txt',['cat','dog','emu']) # Same size, only the mtime changed
+    os.utime(source,ns=(mtime+10**9,mtime+10**9))
+    assert list(LoadBoggleDict(source)) == ['CAT','DOG','EMU']
+    target = CompiledPath(source)
+    with open(target,'r+b') as f: # Compiled by another version
+        f.seek(len(MAGIC)) # The version follows the magic
+        f.write(struct.pack('<H',VERSION+1))
+    with pytest.raises(ValueError):
+        OpenDictFile(target)
+    assert list(LoadBoggleDict(source)) == ['CAT','DOG','EMU']
+    assert list(OpenDictFile(target)) == ['CAT','DOG','EMU'] # Rebuilt
+
+def test_ValidWords():
+    typed = ['quit','QuIt','eat','Sat',
+             'QUITE', # In the dictionary, not on the board
+             'TAS','ATE', # On the board, not in the dictionary
+             'QIT','Q','']
+    assert ValidWords(BOARD,WORDS,typed) == {'QUIT','EAT','SAT'}
+
+def test_ValidWordsStopsAtNonPrefixes():
+    board = [['E']*5 for _ in range(5)] # Every path spells E..E, words would take forever to search
+    assert ValidWords(board,WORDS,['E'*length for length in range(1,26)]) == set()
+
+def test_ScoreWords():
+    submissions = {'p1':['quit','QUIT','Quit','eat','tas'], # A word scores once for each player
+                   'p2':['Sat','quite','qit','EAT'],
+                   'p3':[]}
+    assert ScoreWords(BOARD,WORDS,submissions) == {'p1':4**2+3**2,'p2':3**2+3**2,'p3':0}
+
+@pytest.mark.parametrize('rows,cols',[(4,4),(5,5)])
+def test_BoardScorerEdits(rows,cols):
+    generator = random.Random(rows)
+    letters = ['A','E','I','N','R','S','T','QU']
+    words = {''.join(generator.choices(letters,k=generator.randint(2,6))) for _ in range(1000)}
+    words = sorted(word for word in words if len(word) > 2)
+    tiles = generator.choices(letters,k=rows*cols)
+    scorer = BoardScorer([tiles[row*cols:(row+1)*cols] for row in range(rows)],words)
+    accepted = 0
+    for step in range(300):
+        cell = generator.randrange(rows*cols)
+        tile = generator.choice([letter for letter in letters if letter != scorer.tiles[cell]])
+        delta,removed,added = scorer.Propose(cell,tile)
+        if generator.random() < 0.5: # Rejected edits must leave the scorer as it was
+            scorer.Apply(cell,tile,delta,removed,added)
+            accepted += 1
+        board = scorer.Board()
+        found = set(FindAllWords(board,words))
+        assert scorer.pathCounts.keys() == found and scorer.score == sum(len(word)**2 for word in found)
+        if step % 10 == 9: # Counting all the paths again is slower than solving
+            assert scorer.pathCounts == BoardScorer(board,words).pathCounts
+    assert 0 < accepted < 300
+
+def test_LocalClients():
+    async def Play():
+        server = BoggleServer(WORDS,gameTime=0.2) # A word list is compiled by the server
+        alice,bob,carol = (LocalClient(server) for _ in range(3))
+        assert server.Join(alice,'room','alice',board=BOARD)['op'] == 'joined'
+        assert bob.Join('room','bob')['board'] == BOARD
+        assert carol.Join('other','carol')['op'] == 'joined'
+        assert carol.Join('room','alice')['op'] == 'error' # A taken name doesn't take carol out of her room
+        assert carol.room.name == 'other'
+        assert alice.Submit('quit') == {'op':'word','word':'QUIT','valid':True,'new':True,'score':16}
+        assert alice.Submit('Quit') == {'op':'word','word':'QUIT','valid':True,'new':False,'score':16}
+        assert alice.Submit('tas')['valid'] == False
+        assert bob.Submit('quit')['new'] == True # Found words are counted for each player
+        carol.room.deadline -= 1 # Time is up, but the end of game timer hasn't run yet
+        assert carol.Submit('eat')['op'] == 'error'
+        assert carol.Leave() == {'op':'left','room':'other'}
+        end = {'op':'end','room':'room','scores':{'alice':16,'bob':16}}
+        assert await alice.NextMessage() == end
+        assert await bob.NextMessage() == end
+        assert server.rooms == {} and alice.room == None
+    asyncio.run(Play())
@@ -0,0 +1,118 @@
+'''
+Klotski batch solver,
+reads many layouts from a file (or stdin), solves them in parallel with a
+pool of worker processes and writes a result line for every layout as soon
+as it's solved (so results may come out of order, use the names to match them).
+
+Input - one JSON layout per line (empty lines and lines starting with # are skipped):
+    {"name": "classic",
+     "grid": [[1,10,10,4],[1,10,10,4],[2,7,7,5],[2,8,9,5],[3,0,0,6]],
+     "target": 10,
+     "goal": [[4,1],[4,2]]}
+    grid - rows of block numbers (1..n, 0 is an empty cell), its size sets the board dimensions
+    target - number of the block which must get to the goal
+    goal - cells the target block must cover to win
+
+Output - one JSON result per line:
+    {"name": ..., "solvable": true, "length": 116, "moves": [[block,action],...],
+     "expanded": 1234, "seconds": 0.2}
+    or {"name": ..., "error": ...} for layouts which can't be read.
+
+Usage:
+    python KlotskiBatch.py layouts.jsonl [-w workers] [-m astar|bidirectional] (astar by default)
+    python KlotskiBatch.py - < layouts.jsonl
+
+Author: Arik Voronov
+Date: 18.10.26
+'''
+import json
+import multiprocessing as mp
+from time import time
+from KlotskiPuzzle import *
+from KlotskiPuzzleAStar import SolveOptimal
+
+def ReadLayouts(lines):
+    ''' Parse layout lines, yields layout dictionaries (unreadable lines are yielded as errors) '''
+    for number,line in enumerate(lines,1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        try:
+            layout = json.loads(line)
+        except ValueError as e:
+            layout = {'error':'line {}: {}'.format(number,e)}
+        if not isinstance(layout,dict):
+            layout = {'error':'line {}: a layout must be a JSON object'.format(number)}
+        layout.setdefault('name','line {}'.format(number))
+        yield layout
+
+def SolveLayout(layout,mode = 'astar'):
+    '''
+    Solve a single layout (runs in a worker process)
+
+    Parameters
+    ----------
+    layout : dict
+        layout as read by ReadLayouts.
+    mode : string
+        search mode of SolveOptimal.
+
+    Returns
+    -------
+    result : dict
+        result line for the layout.
+    '''
+    name = layout['name']
+    if 'error' in layout:
+        return {'name':name,'error':layout['error']}
+    t0 = time()
+    counts = {}
+    try: # Any failure of a layout (including the codec of its blocks) is reported in its own result line
+        KP = CreateKP(layout['grid'],layout['target'],layout['goal'])
+        path = SolveOptimal(KP,mode,counts)
+    except (KeyError,TypeError,IndexError,ValueError) as e:
+        return {'name':name,'error':'bad layout: {}'.format(e)}
+    except Exception as e:
+        return {'name':name,'error':'{}: {}'.format(type(e).__name__,e)}
+    result = {'name':name,'solvable':path != None}
+    if path != None:
+        result['length'] = len(path)
+        result['moves'] = path
+    result['expanded'] = counts['expanded']
+    result['seconds'] = round(time()-t0,4)
+    return result
+
+def SolveModeLayout(arguments):
+    ''' Pool helper, arguments is a (layout, mode) couple '''
+    return SolveLayout(*arguments)
+
+def SolveBatch(layouts,workers = None,mode = 'astar'):
+    '''
+    Solve layouts in parallel, yields results as soon as they are ready
+
+    Parameters
+    ----------
+    layouts : iterable
+        layout dictionaries, read lazily so the input may be a stream.
+    workers : int
+        number of worker processes (default: number of cores).
+    mode : string
+        search mode of SolveOptimal.
+    '''
+    with mp.Pool(workers) as pool:
+        for result in pool.imap_unordered(SolveModeLayout,((layout,mode) for layout in layouts)):
+            yield result
+
+if __name__ =="__main__":
+    import argparse
+    import sys
+    parser = argparse.ArgumentParser(description='Solve many Klotski layouts in parallel')
+    parser.add_argument('layouts',help='layouts file (JSON lines), - for stdin')
+    parser.add_argument('-w','--workers',type=int,default=None,help='number of worker processes')
+    parser.add_argument('-m','--mode',default='astar',choices=['astar','bidirectional'])
+    args = parser.parse_args()
+    source = sys.stdin if args.layouts == '-' else open(args.layouts)
+    with source:
+        for result in SolveBatch(ReadLayouts(source),args.workers,args.mode):
+            sys.stdout.write(json.dumps(result)+'\n')
+            sys.stdout.flush()
@@ -0,0 +1,197 @@
+'''
+Klotski distance-to-goal database,
+every position reachable from a layout is enumerated once (retrograde analysis):
+a BFS from all the reachable winning states gives each position its exact
+distance to the nearest win.
+The distances are stored on disk in an open addressing hash table, keyed by the
+canonical state encoding, which is memory mapped when loaded - so the optimal
+next move from any position is found with a few lookups and no search.
+
+File layout (little endian):
+    header - magic, version, layout fingerprint, key size, capacity, count
+    keys - capacity fixed size keys (0 marks an empty slot)
+    distances - capacity unsigned shorts
+
+Author: Arik Voronov
+Date: 18.10.26
+'''
+import mmap
+import struct
+import zlib
+from KlotskiPuzzle import *
+from KlotskiState import StateCodec,UnpackMoves,HashState
+
+MAGIC = b'KLDT'
+VERSION = 1
+HEADER = struct.Struct('<4sHIHQQ') # magic, version, fingerprint, key bytes, capacity, count
+UNSOLVABLE = 0xFFFF
+
+def LayoutFingerprint(codec):
+    ''' Identifies the layout a table was built for (dimensions, shapes and goal) '''
+    layout = repr((codec.rows,codec.cols,codec.shapes,codec.targetClass,codec.goalMask))
+    return zlib.crc32(layout.encode())
+
+def Slot(key,capacity):
+    ''' Home slot of a key in the hash table '''
+    return (HashState(key)>>16) % capacity
+
+def EnumerateDistances(KP,codec):
+    '''
+    Enumerate all the positions reachable from KP and find their distance to a win
+
+    Returns
+    -------
+    distances : dict
+        {canonical state: moves to the nearest winning state (UNSOLVABLE if none)}.
+    '''
+    start = codec.Canonical(codec.Encode(KP))
+    reachable = {start}
+    frontier = [start]
+    while frontier:
+        newFrontier = []
+        for state in frontier:
+            for nextState in codec.GetNeighbors(state):
+                key = codec.Canonical(nextState)
+                if key not in reachable:
+                    reachable.add(key)
+                    newFrontier.append(key)
+        frontier = newFrontier
+    # Retrograde BFS, moves are reversible so the same move generator is used
+    frontier = [state for state in reachable if codec.GameWon(state)]
+    distances = dict.fromkeys(frontier,0)
+    depth = 0
+    while frontier:
+        depth += 1
+        newFrontier = []
+        for state in frontier:
+            for nextState in codec.GetNeighbors(state):
+                key = codec.Canonical(nextState)
+                if key not in distances:
+                    distances[key] = depth
+                    newFrontier.append(key)
+        frontier = newFrontier
+    for state in reachable:
+        if state not in distances:
+            distances[state] = UNSOLVABLE
+    return distances
+
+def BuildDistanceTable(KP,path):
+    '''
+    Build the distance table of the layout of KP and write it to disk
+
+    Parameters
+    ----------
+    KP : KlotskiPuzzle object
+        initial state of the layout.
+    path : string
+        output file.
+
+    Returns
+    -------
+    count : int
+        number of (canonical) positions in the table.
+    '''
+    codec = StateCodec(KP)
+    distances = EnumerateDistances(KP,codec)
+    keyBytes = (codec.cellCount*codec.bits+7)//8
+    capacity = 1
+    while capacity < 2*len(distances): # Load factor of at most 0.5
+        capacity *= 2
+    keys = bytearray(capacity*keyBytes)
+    values = [UNSOLVABLE]*capacity
+    for key,distance in distances.items():
+        slot = Slot(key,capacity)
+        while values[slot] != UNSOLVABLE or keys[slot*keyBytes:(slot+1)*keyBytes].strip(b'\0'):
+            slot = (slot+1) % capacity
+        keys[slot*keyBytes:(slot+1)*keyBytes] = key.to_bytes(keyBytes,'little')
+        values[slot] = distance
+    with open(path,'wb') as f:
+        f.write(HEADER.pack(MAGIC,VERSION,LayoutFingerprint(codec),keyBytes,capacity,len(distances)))
+        f.write(keys)
+        f.write(struct.pack('<{}H'.format(capacity),*values))
+    return len(distances)
+
+class DistanceTable():
+    '''
+    Read only, memory mapped distance table.
+    The table must have been built for the layout of the input KP.
+    '''
+    def __init__(self,path,KP):
+        self.codec = StateCodec(KP)
+        self.file = open(path,'rb')
+        self.data = mmap.mmap(self.file.fileno(),0,access=mmap.ACCESS_READ)
+        magic,version,fingerprint,self.keyBytes,self.capacity,self.count = HEADER.unpack_from(self.data,0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('{} is not a distance table (version {})'.format(path,VERSION))
+        if fingerprint != LayoutFingerprint(self.codec):
+            raise ValueError('{} was built for a different layout'.format(path))
+        self.keysOffset = HEADER.size
+        self.distancesOffset = self.keysOffset+self.capacity*self.keyBytes
+
+    def Close(self):
+        self.data.close()
+        self.file.close()
+
+    def Lookup(self,state):
+        ''' Distance of an encoded state to the nearest win, None if the state isn't in the table '''
+        key = self.codec.Canonical(state)
+        target = key.to_bytes(self.keyBytes,'little')
+        keyBytes = self.keyBytes
+        slot = Slot(key,self.capacity)
+        while True:
+            offset = self.keysOffset+slot*keyBytes
+            stored = self.data[offset:offset+keyBytes]
+            if stored == target:
+                return struct.unpack_from('<H',self.data,self.distancesOffset+2*slot)[0]
+            if not stored.strip(b'\0'):
+                return None
+            slot = (slot+1) % self.capacity
+
+    def Distance(self,KP):
+        ''' Moves to the nearest win from KP, None if KP isn't reachable in this layout '''
+        distance = self.Lookup(self.codec.Encode(KP))
+        if distance == UNSOLVABLE:
+            return None
+        return distance
+
+    def GetHint(self,KP):
+        '''
+        Get an optimal next move
+
+        Returns
+        -------
+        list
+            [block,action] couple, None if the game is won or can't be won from KP.
+        '''
+        state = self.codec.Encode(KP)
+        distance = self.Lookup(state)
+        if distance in [None,0,UNSOLVABLE]:
+            return None
+        for move,nextState in self.codec.GetMoves(state):
+            if self.Lookup(nextState) == distance-1:
+                return UnpackMoves(KP,[move])[0]
+        return None
+
+    def Solve(self,KP):
+        ''' Follow the hints to a win, returns a shortest list of [block,action] couples '''
+        path = []
+        hint = self.GetHint(KP)
+        while hint != None:
+            path.append(hint)
+            KP = KP.MoveBlock(*hint)
+            hint = self.GetHint(KP)
+        return path
+
+if __name__ =="__main__":
+    import sys
+    from time import time
+    path = sys.argv[1] if len(sys.argv)>1 else 'klotski_distances.bin'
+    KP = CreateNewKP(5,4)
+    t0 = time()
+    count = BuildDistanceTable(KP,path)
+    print('Stored {} positions in {} ({:.2f} sec)'.format(count,path,time()-t0))
+    table = DistanceTable(path,KP)
+    t0 = time()
+    solution = table.Solve(KP)
+    print('Optimal solution has {} moves ({:.3f} sec)'.format(len(solution),time()-t0))
+    table.Close()
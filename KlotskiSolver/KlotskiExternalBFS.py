@@ -0,0 +1,220 @@
+'''
+Klotski puzzle solver, external memory (disk backed) BFS.
+Every BFS layer is kept on disk as a sorted file of fixed size records
+(canonical encoded states, big endian so byte order is numeric order).
+The successors of a layer are collected in memory up to a budget, then sorted
+and written out as runs. The runs are merged (in several passes if there are
+more runs than the files which can be read at once within the budget), and
+duplicates are removed with a streaming merge against the two previous layers -
+moves are reversible, so a successor of layer d can only be in layers d-1, d or d+1.
+Winning states are not expanded (like BreadthFirstSearch), so they're kept in
+a separate sorted file which is also subtracted.
+Memory use and open files are bounded by the budget regardless of the size of the state space.
+
+Author: Arik Voronov
+Date: 18.10.26
+'''
+import heapq
+import os
+import shutil
+import tempfile
+from KlotskiPuzzle import *
+from KlotskiState import StateCodec
+
+RECORD_OVERHEAD = 100 # Approximate bytes of memory per buffered state (python int in a set)
+CHUNK_RECORDS = 4096 # Records read from disk at a time
+MAX_FAN_IN = 64 # Most runs merged at once (open files), whatever the budget
+
+def ReadRecords(path,recordSize):
+    ''' Stream the records of a sorted file '''
+    with open(path,'rb') as f:
+        while True:
+            chunk = f.read(recordSize*CHUNK_RECORDS)
+            if not chunk:
+                return
+            for i in range(0,len(chunk),recordSize):
+                yield chunk[i:i+recordSize]
+
+def WriteRecords(path,records):
+    ''' Write records to a file, returns the number of records written '''
+    count = 0
+    with open(path,'wb') as f:
+        for record in records:
+            f.write(record)
+            count += 1
+    return count
+
+def MergeUnique(streams):
+    ''' Merge sorted record streams, dropping duplicates '''
+    last = None
+    for record in heapq.merge(*streams):
+        if record != last:
+            yield record
+            last = record
+
+def Subtract(records,excluded):
+    ''' Records of a sorted stream which don't appear in another sorted stream '''
+    excluded = iter(excluded)
+    current = next(excluded,None)
+    for record in records:
+        while current != None and current < record:
+            current = next(excluded,None)
+        if record != current:
+            yield record
+
+class ExternalBFS():
+    '''
+    Disk backed BFS over the canonical states reachable from a KP
+
+    Parameters
+    ----------
+    KP : KlotskiPuzzle object
+        initial state of the puzzle grid.
+    memoryBudget : int
+        approximate bytes of memory for buffering successors.
+    workDir : string
+        directory for the layer files (a temporary directory by default).
+    '''
+    def __init__(self,KP,memoryBudget = 64*2**20,workDir = None):
+        self.codec = StateCodec(KP)
+        self.KP = KP
+        self.recordSize = (self.codec.cellCount*self.codec.bits+7)//8
+        self.bufferLimit = max(1,memoryBudget//(self.recordSize+RECORD_OVERHEAD))
+        # Every run being merged has a read chunk in memory
+        self.fanIn = max(2,min(MAX_FAN_IN,memoryBudget//(self.recordSize*CHUNK_RECORDS)))
+        self.ownDir = workDir == None
+        self.workDir = tempfile.mkdtemp(prefix='klotski_') if self.ownDir else workDir
+        self.runCount = 0
+
+    def Path(self,name):
+        return os.path.join(self.workDir,name)
+
+    def Record(self,state):
+        return state.to_bytes(self.recordSize,'big')
+
+    def WriteRun(self,buffer):
+        ''' Sort the buffered states and write them as a run file '''
+        path = self.Path('run_{}.bin'.format(self.runCount))
+        self.runCount += 1
+        WriteRecords(path,(self.Record(state) for state in sorted(buffer)))
+        return path
+
+    def ExpandLayer(self,layerPath):
+        ''' Write the successors of a layer as sorted runs, returns the run files '''
+        codec = self.codec
+        runs = []
+        buffer = set()
+        for record in ReadRecords(layerPath,self.recordSize):
+            state = int.from_bytes(record,'big')
+            if codec.GameWon(state): #There's no more branching after the game is won
+                continue
+            for nextState in codec.GetNeighbors(state):
+                buffer.add(codec.Canonical(nextState))
+            if len(buffer) >= self.bufferLimit:
+                runs.append(self.WriteRun(buffer))
+                buffer = set()
+        if buffer:
+            runs.append(self.WriteRun(buffer))
+        return runs
+
+    def MergeRuns(self,runs):
+        '''
+        Merge runs (dropping duplicates) fanIn at a time until there are
+        at most fanIn of them, returns the remaining run files
+        '''
+        while len(runs) > self.fanIn:
+            merged = []
+            for i in range(0,len(runs),self.fanIn):
+                group = runs[i:i+self.fanIn]
+                if len(group) == 1:
+                    merged.append(group[0])
+                    continue
+                path = self.Path('run_{}.bin'.format(self.runCount))
+                self.runCount += 1
+                WriteRecords(path,MergeUnique([ReadRecords(run,self.recordSize) for run in group]))
+                for run in group:
+                    os.remove(run)
+                merged.append(path)
+            runs = merged
+        return runs
+
+    def Search(self):
+        '''
+        Run the BFS until no new states are found
+
+        Returns
+        -------
+        result : dict
+            'solutions' - number of solutions (as counted by BreadthFirstSearch),
+            'shortest' - number of moves of the shortest solution (None if not solvable),
+            'levels' - number of new states found at every depth,
+            'visited' - number of visited (canonical) states.
+        '''
+        codec = self.codec
+        start = codec.Canonical(codec.Encode(self.KP))
+        layers = [self.Path('layer_0.bin')]
+        WriteRecords(layers[0],[self.Record(start)])
+        solutionsPath = self.Path('solutions.bin')
+        WriteRecords(solutionsPath,[])
+        levels = [1]
+        solutions = 1 if codec.GameWon(start) else 0
+        shortest = 0 if solutions else None
+        while True:
+            runs = self.MergeRuns(self.ExpandLayer(layers[-1]))
+            excluded = [ReadRecords(path,self.recordSize) for path in layers[-2:]+[solutionsPath]]
+            newStates = Subtract(MergeUnique([ReadRecords(run,self.recordSize) for run in runs]),MergeUnique(excluded))
+            layerPath = self.Path('layer_{}.bin'.format(len(layers)))
+            # The winning states of the new layer are also written to their own (sorted) file
+            winningPath = self.Path('winning.bin')
+            winning = 0
+            count = 0
+            with open(layerPath,'wb') as f, open(winningPath,'wb') as w:
+                for record in newStates:
+                    count += 1
+                    if codec.GameWon(int.from_bytes(record,'big')):
+                        winning += 1
+                        w.write(record)
+                    f.write(record)
+            for run in runs:
+                os.remove(run)
+            if count == 0:
+                os.remove(layerPath)
+                os.remove(winningPath)
+                break
+            if winning:
+                if shortest == None:
+                    shortest = len(layers)
+                solutions += winning
+                merged = self.Path('solutions_new.bin')
+                WriteRecords(merged,MergeUnique([ReadRecords(solutionsPath,self.recordSize),ReadRecords(winningPath,self.recordSize)]))
+                os.replace(merged,solutionsPath)
+            os.remove(winningPath)
+            levels.append(count)
+            layers.append(layerPath)
+            if len(layers) > 3: # Only the last two layers are needed for removing duplicates
+                os.remove(layers[-4])
+        return {'solutions':solutions,'shortest':shortest,'levels':levels,'visited':sum(levels)}
+
+    def Close(self):
+        ''' Remove the working directory (if it was created by this object) '''
+        if self.ownDir:
+            shutil.rmtree(self.workDir,ignore_errors=True)
+
+def ExternalBreadthFirstSearch(KP,memoryBudget = 64*2**20,workDir = None):
+    ''' Run an ExternalBFS and clean up its files, see ExternalBFS.Search for the result '''
+    search = ExternalBFS(KP,memoryBudget,workDir)
+    try:
+        return search.Search()
+    finally:
+        search.Close()
+
+if __name__ =="__main__":
+    import sys
+    from time import time
+    budget = int(sys.argv[1]) if len(sys.argv)>1 else 64*2**20
+    KP = CreateNewKP(5,4)
+    t0 = time()
+    result = ExternalBreadthFirstSearch(KP,budget)
+    print('Visited {} states in {:.2f} sec'.format(result['visited'],time()-t0))
+    print('Found {} unique solution paths'.format(result['solutions']))
+    print('Shortest path has {} steps'.format(result['shortest']+1))
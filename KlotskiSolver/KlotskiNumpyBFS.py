@@ -0,0 +1,169 @@
+'''
+Klotski puzzle solver, vectorized BFS.
+Every BFS layer is a numpy array of encoded states (unsigned 64 bit), and the
+whole layer is processed with array operations instead of one state at a time:
+    legal moves - the anchors of all the blocks of the layer are found at once, and for
+                  every action the newly covered cells and the state delta of each
+                  block come from (anchor cell, cell code) lookup tables
+    successors - masked states + the move's state delta
+    canonical keys - the images of the layer are summed with per cell lookup tables,
+                     the images of the successors are the layer's images + the move's image delta
+    visited - the layer is sorted and deduplicated (adjacent differences), checked
+              with searchsorted against the sorted visited array and inserted in it
+Only layouts whose states fit in 64 bits are supported (e.g. up to 21 cells
+with 3 bits per cell).
+
+Author: Arik Voronov
+Date: 18.10.26
+'''
+import numpy as np
+from KlotskiPuzzle import *
+from KlotskiState import StateCodec
+
+class VectorCodec():
+    '''
+    Array versions of the StateCodec tables
+
+    Parameters
+    ----------
+    codec : StateCodec object
+        codec of the puzzle layout.
+    '''
+    def __init__(self,codec):
+        if codec.cellCount*codec.bits > 64:
+            raise ValueError('States of a {}x{} layout don\'t fit in 64 bits'.format(codec.rows,codec.cols))
+        self.codec = codec
+        self.shifts = np.arange(codec.cellCount,dtype=np.uint64)*np.uint64(codec.bits)
+        self.cellBits = np.uint64(1) << np.arange(codec.cellCount,dtype=np.uint64)
+        # (action, anchor cell, anchor code) tables of the move from the codec's move tables:
+        # newly covered cells mask, state delta (mod 2**64) and whether the block stays on the board
+        shape = (4,codec.cellCount,codec.codeMask+1)
+        self.newCells = np.zeros(shape,dtype=np.uint64)
+        self.deltas = np.zeros(shape,dtype=np.uint64)
+        self.onBoard = np.zeros(shape,dtype=bool)
+        for k,classMoves in enumerate(codec.moves):
+            for anchor,anchorMoves in enumerate(classMoves):
+                for action,newAnchor,newCells,delta in anchorMoves:
+                    self.newCells[action,anchor,k+2] = newCells
+                    self.deltas[action,anchor,k+2] = delta % 2**64
+                    self.onBoard[action,anchor,k+2] = True
+        # Per symmetry (action, anchor cell, anchor code) table of the move's image delta
+        self.imageDeltas = np.zeros((len(codec.symmetryValues),)+shape,dtype=np.uint64)
+        for s,values in enumerate(codec.symmetryValues):
+            for k,classMoves in enumerate(codec.moves):
+                for anchor,anchorMoves in enumerate(classMoves):
+                    for action,newAnchor,newCells,delta in anchorMoves:
+                        self.imageDeltas[s,action,anchor,k+2] = (values[k][newAnchor]-values[k][anchor]) % 2**64
+        # Per cell lookup tables {code: value of the block's image} for every symmetry
+        self.imageTables = []
+        for values in codec.symmetryValues:
+            table = np.zeros((codec.cellCount,codec.codeMask+1),dtype=np.uint64)
+            for k in range(len(codec.shapes)):
+                for anchor in range(codec.cellCount):
+                    if values[k][anchor] != None:
+                        table[anchor,k+2] = values[k][anchor]
+            self.imageTables.append(table)
+        self.targetCode = None if codec.targetClass == None else codec.targetClass+2
+
+    def Codes(self,states):
+        ''' (cells, states) array of cell codes '''
+        return (states[None,:] >> self.shifts[:,None]) & np.uint64(self.codec.codeMask)
+
+    def GameWon(self,states,codes = None):
+        ''' Boolean mask of the winning states '''
+        if codes is None:
+            codes = self.Codes(states)
+        won = np.zeros(len(states),dtype=bool)
+        for anchor in self.codec.winAnchors:
+            won |= codes[anchor] == self.targetCode
+        return won
+
+    def Images(self,codes):
+        ''' List of the symmetric images of the states (one array for every symmetry) '''
+        codes = codes.astype(np.intp)
+        cells = np.arange(self.codec.cellCount)[:,None]
+        return [table[cells,codes].sum(axis=0,dtype=np.uint64) for table in self.imageTables]
+
+    def Successors(self,states,codes = None):
+        ''' Canonical keys of all the states one legal move away (with duplicates) '''
+        if codes is None:
+            codes = self.Codes(states)
+        occupied = ((codes != 0).astype(np.uint64)*self.cellBits[:,None]).sum(axis=0,dtype=np.uint64)
+        anchors,blocks = np.nonzero(codes >= 2) # Every block of every state, by its anchor cell
+        blockCodes = codes[anchors,blocks].astype(np.intp)
+        blockStates = states[blocks]
+        blockOccupied = occupied[blocks]
+        blockImages = [images[blocks] for images in self.Images(codes)]
+        successors = []
+        for action in range(4):
+            legal = self.onBoard[action,anchors,blockCodes]
+            legal &= (blockOccupied & self.newCells[action,anchors,blockCodes]) == 0
+            moved = (anchors[legal],blockCodes[legal])
+            keys = blockStates[legal]+self.deltas[action][moved]
+            for s,images in enumerate(blockImages):
+                keys = np.minimum(keys,images[legal]+self.imageDeltas[s,action][moved])
+            successors.append(keys)
+        return np.concatenate(successors)
+
+def SortedUnique(values):
+    ''' Sorted values without duplicates (np.unique without its hashing and bookkeeping) '''
+    values = np.sort(values)
+    if len(values) < 2:
+        return values
+    keep = np.empty(len(values),dtype=bool)
+    keep[0] = True
+    np.not_equal(values[1:],values[:-1],out=keep[1:])
+    return values[keep]
+
+def VectorBreadthFirstSearch(KP):
+    '''
+    Layer by layer BFS over all the canonical states reachable from KP
+
+    Parameters
+    ----------
+    KP : KlotskiPuzzle object
+        initial state of the puzzle grid.
+
+    Returns
+    -------
+    result : dict
+        'solutions' - number of solutions (as counted by BreadthFirstSearch),
+        'shortest' - number of moves of the shortest solution (None if not solvable),
+        'levels' - number of new states found at every depth,
+        'visited' - number of visited (canonical) states.
+    '''
+    codec = StateCodec(KP)
+    vectors = VectorCodec(codec)
+    layer = np.array([codec.Canonical(codec.Encode(KP))],dtype=np.uint64)
+    visited = layer.copy() # Sorted
+    levels = [1]
+    solutions = 0
+    shortest = None
+    while len(layer):
+        codes = vectors.Codes(layer)
+        won = vectors.GameWon(layer,codes)
+        if won.any():
+            if shortest == None:
+                shortest = len(levels)-1
+            solutions += int(won.sum())
+        #There's no more branching after the game is won
+        keep = ~won
+        candidates = SortedUnique(vectors.Successors(layer[keep],codes[:,keep]))
+        position = np.searchsorted(visited,candidates)
+        seen = np.zeros(len(candidates),dtype=bool)
+        inRange = position < len(visited)
+        seen[inRange] = visited[position[inRange]] == candidates[inRange]
+        layer = candidates[~seen]
+        if len(layer):
+            levels.append(len(layer))
+            visited = np.insert(visited,np.searchsorted(visited,layer),layer) # Both are sorted and disjoint
+    return {'solutions':solutions,'shortest':shortest,'levels':levels,'visited':len(visited)}
+
+if __name__ =="__main__":
+    from time import time
+    KP = CreateNewKP(5,4)
+    t0 = time()
+    result = VectorBreadthFirstSearch(KP)
+    print('Visited {} states in {:.2f} sec'.format(result['visited'],time()-t0))
+    print('Found {} unique solution paths'.format(result['solutions']))
+    print('Shortest path has {} steps'.format(result['shortest']+1))
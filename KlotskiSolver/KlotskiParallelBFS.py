@@ -0,0 +1,165 @@
+'''
+Klotski puzzle solver, level synchronous parallel BFS.
+The visited states are partitioned between worker processes by a hash of the
+(canonical) encoded state, each worker owns one partition and its share of the frontier.
+Every level:
+    1. each worker expands its frontier and sends every successor to the worker which owns it
+    2. each worker removes the successors it already visited, the rest are its new frontier
+The coordinating process only synchronizes the levels and sums up the results,
+which are identical to the serial BreadthFirstSearch (distances and solution count).
+
+Author: Arik Voronov
+Date: 18.10.26
+'''
+import multiprocessing as mp
+import os
+from KlotskiPuzzle import *
+from KlotskiState import StateCodec,HashState
+
+def Owner(key,workers):
+    ''' The worker which owns a state, the key is mixed so neighboring states spread evenly '''
+    return (HashState(key)>>32) % workers
+
+def Worker(index,codec,commands,inboxes):
+    '''
+    Worker process loop, owns the states for which Owner(state) == index
+
+    Parameters
+    ----------
+    index : int
+        worker number.
+    codec : StateCodec object
+        codec of the puzzle layout.
+    commands : Connection
+        pipe to the coordinator.
+    inboxes : list
+        queues of all the workers, successors are sent to their owner's queue.
+    '''
+    workers = len(inboxes)
+    visited = {} # {canonical state: distance}
+    frontier = []
+    depth = 0
+    while True:
+        command,argument = commands.recv()
+        if command == 'seed':
+            visited[argument] = 0
+            if codec.GameWon(argument):
+                commands.send(1)
+            else:
+                frontier.append(argument)
+                commands.send(0)
+        elif command == 'expand':
+            buckets = [[] for _ in range(workers)]
+            for state in frontier:
+                for nextState in codec.GetNeighbors(state):
+                    key = codec.Canonical(nextState)
+                    buckets[Owner(key,workers)].append(key)
+            for owner,bucket in enumerate(buckets):
+                inboxes[owner].put(bucket)
+            # Collect the successors owned by this worker from all the workers
+            depth += 1
+            frontier = []
+            solutions = 0
+            for _ in range(workers):
+                for key in inboxes[index].get():
+                    if key in visited:
+                        continue
+                    visited[key] = depth
+                    if codec.GameWon(key): #There's no more branching after the game is won
+                        solutions += 1
+                    else:
+                        frontier.append(key)
+            commands.send((len(frontier),solutions))
+        elif command == 'distances':
+            commands.send(visited)
+        elif command == 'stop':
+            commands.send(len(visited))
+            return
+
+def ParallelBreadthFirstSearch(KP,workers = None,returnDistances = False):
+    '''
+    Parallel BFS over all the states reachable from KP
+
+    Parameters
+    ----------
+    KP : KlotskiPuzzle object
+        initial state of the puzzle grid.
+    workers : int
+        number of worker processes (default: number of cores).
+    returnDistances : bool
+        also gather {canonical state: distance} of every visited state.
+
+    Returns
+    -------
+    result : dict
+        'solutions' - number of solutions (as counted by BreadthFirstSearch),
+        'shortest' - number of moves of the shortest solution (None if not solvable),
+        'levels' - number of new states found at every depth,
+        'visited' - number of visited (canonical) states,
+        'distances' - only if returnDistances is True.
+    '''
+    if workers == None:
+        workers = os.cpu_count()
+    codec = StateCodec(KP)
+    inboxes = [mp.Queue() for _ in range(workers)]
+    pipes = []
+    processes = []
+    for index in range(workers):
+        coordinatorEnd,workerEnd = mp.Pipe()
+        process = mp.Process(target=Worker,args=(index,codec,workerEnd,inboxes),daemon=True)
+        process.start()
+        pipes.append(coordinatorEnd)
+        processes.append(process)
+    try:
+        start = codec.Canonical(codec.Encode(KP))
+        owner = pipes[Owner(start,workers)]
+        owner.send(('seed',start))
+        solutions = owner.recv()
+        levels = [1]
+        shortest = 0 if solutions else None
+        frontierSize = 1-solutions
+        while frontierSize:
+            for pipe in pipes:
+                pipe.send(('expand',None))
+            frontierSize = 0
+            levelSolutions = 0
+            found = 0
+            for pipe in pipes:
+                newFrontier,newSolutions = pipe.recv()
+                frontierSize += newFrontier
+                levelSolutions += newSolutions
+                found += newFrontier+newSolutions
+            if levelSolutions and shortest == None:
+                shortest = len(levels)
+            solutions += levelSolutions
+            if found:
+                levels.append(found)
+        result = {'solutions':solutions,'shortest':shortest,'levels':levels}
+        if returnDistances:
+            distances = {}
+            for pipe in pipes:
+                pipe.send(('distances',None))
+                distances.update(pipe.recv())
+            result['distances'] = distances
+        visited = 0
+        for pipe in pipes:
+            pipe.send(('stop',None))
+            visited += pipe.recv()
+        result['visited'] = visited
+    finally:
+        for process in processes:
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
+    return result
+
+if __name__ =="__main__":
+    import sys
+    from time import time
+    workers = int(sys.argv[1]) if len(sys.argv)>1 else None
+    KP = CreateNewKP(5,4)
+    t0 = time()
+    result = ParallelBreadthFirstSearch(KP,workers)
+    print('Visited {} states in {:.2f} sec'.format(result['visited'],time()-t0))
+    print('Found {} unique solution paths'.format(result['solutions']))
+    print('Shortest path has {} steps'.format(result['shortest']+1))
@@ -29,15 +29,24 @@ class KlotskiPuzzle():
     Stores a Klotski puzzle grid and enables valid block movements.
     Defines the winning condition.
     Valid actions for movement : [0:up, 1:right, 2:down, 3:left]
+    The game is won when the target block covers all the goal cells.
     '''
-    def __init__(self,rows,cols,blockList,grid):
+    def __init__(self,rows,cols,blockList,grid,goalCells = None,emptyCells = None):
         self.rows = rows
         self.cols = cols
         self.blockList = blockList
         self.previousBoard = None
         self.grid=grid
+        if goalCells == None:
+            goalCells = [(4,1),(4,2)] # Bottom middle of the classic 5x4 board
+        self.goalCells = goalCells
         self.distance = 0
         self.actionKeys = [(-1,0),(0,1),(1,0),(0,-1)]
+        if emptyCells == None:
+            emptyCells = [(r,c) for r in range(rows) for c in range(cols) if grid[r][c]==0]
+        self.emptyCells = emptyCells
+        self.validActions = None # Cached legal moves of the current state (see GetAllValidActions)
+        self.moveStack = [] # Undo information for UnmakeMove
     def MoveBlock(self,blockNumber,action):
         '''
         Creates a new block, moved according to the input action, 
@@ -72,15 +81,72 @@ class KlotskiPuzzle():
             newGrid[c[0]][c[1]]=newBlock.number
         blockList = list(self.blockList)
         blockList[blockNumber-1] = newBlock
-        return KlotskiPuzzle(self.rows,self.cols,blockList,newGrid)  
+        vacated,covered = self.ChangedCells(block,newBlock)
+        emptyCells = [cell for cell in self.emptyCells if cell not in covered]+vacated
+        return KlotskiPuzzle(self.rows,self.cols,blockList,newGrid,self.goalCells,emptyCells)
+    def MakeMove(self,blockNumber,action):
+        '''
+        Move a block in place (no new grid or KP is created),
+        the move can be undone using UnmakeMove.
+        
+        ** DOESN'T CHECK IF THE MOVE IS LEGAL **
+
+        Parameters
+        ----------
+        blockNumber : int
+            number of the block to move
+        action : int
+            action key 
+        '''
+        block = self.blockList[blockNumber-1]
+        newBlock = Block(block.number,block.Move(action),block.target)
+        self.moveStack.append((block,self.emptyCells,self.validActions))
+        for r,c in block.cells:
+            self.grid[r][c]=0
+        for r,c in newBlock.cells:
+            self.grid[r][c]=blockNumber
+        self.blockList[blockNumber-1] = newBlock
+        vacated,covered = self.ChangedCells(block,newBlock)
+        self.emptyCells = [cell for cell in self.emptyCells if cell not in covered]+vacated
+        self.validActions = None # Computed again only if they're asked for
+    def UnmakeMove(self):
+        ''' Undo the last move made by MakeMove '''
+        block,emptyCells,validActions = self.moveStack.pop()
+        for r,c in self.blockList[block.number-1].cells:
+            self.grid[r][c]=0
+        for r,c in block.cells:
+            self.grid[r][c]=block.number
+        self.blockList[block.number-1] = block
+        self.emptyCells = emptyCells
+        self.validActions = validActions
+    def ChangedCells(self,block,newBlock):
+        ''' Cells left empty and cells newly covered when a block is moved '''
+        vacated = [cell for cell in block.cells if cell not in newBlock.cells]
+        covered = [cell for cell in newBlock.cells if cell not in block.cells]
+        return vacated,covered
     def GetAllValidActions(self):
-        ''' Get all legal [block,action] pairs in the current state'''
-        validList = []
-        for action in [0,1,2,3]:
-            for block in self.blockList:
-                if self.LegalMove(block,action):
-                    validList.append([block.number,action])
-        return validList 
+        '''
+        Get all legal [block,action] pairs in the current state (in block and action order).
+        A legal move always brings a block into an empty cell, so only the
+        blocks next to the empty cells are checked. The list is cached until the
+        next move (UnmakeMove restores the list of the previous state), so it must not be changed.
+        '''
+        if self.validActions == None:
+            validActions = set()
+            for r,c in self.emptyCells:
+                for action,shift in enumerate(self.actionKeys):
+                    # The block on the opposite side of the empty cell moves into it
+                    nr = r - shift[0]
+                    nc = c - shift[1]
+                    if nr <0 or nr>= self.rows or nc <0 or nc>= self.cols:
+                        continue
+                    number = self.grid[nr][nc]
+                    if number == 0 or (number,action) in validActions:
+                        continue
+                    if self.LegalMove(self.blockList[number-1],action):
+                        validActions.add((number,action))
+            self.validActions = [[number,action] for number,action in sorted(validActions)]
+        return self.validActions
     def LegalMove(self,block,action):
         ''' Check if block can be moved using the input action '''
         shift = self.actionKeys[action]
@@ -97,8 +163,12 @@ class KlotskiPuzzle():
                 return False
         return True
     def GameWon(self):
-        if self.grid[4][1] ==10 and self.grid[4][2]==10:
-            return True
+        for block in self.blockList:
+            if block.target:
+                for r,c in self.goalCells:
+                    if self.grid[r][c] != block.number:
+                        return False
+                return True
         return False
     def RenderInConsole(self):
         print('\n')
@@ -124,14 +194,84 @@ def CreateNewKP(rows,cols):
             [2, 8, 9,5],
             [3, 0, 0,6],
             ]
+    return CreateKP(grid,10,[(4,1),(4,2)])
+
+def CreateKP(grid,target,goalCells):
+    '''
+    Create a KP from any grid of block numbers
+
+    Parameters
+    ----------
+    grid : list
+        rows of block numbers, blocks are numbered 1..n and 0 is an empty cell.
+    target : int
+        number of the block which must get to the goal.
+    goalCells : list
+        (row,col) cells the target block must cover to win.
+
+    Returns
+    -------
+    KP object
+    '''
+    rows = len(grid)
+    cols = len(grid[0])
+    if any(len(r) != cols for r in grid):
+        raise ValueError('All the grid rows must have {} cells'.format(cols))
+    goalCells = [tuple(cell) for cell in goalCells]
+    if not goalCells:
+        raise ValueError('No goal cells')
+    for cell in goalCells:
+        if len(cell) != 2 or not all(isinstance(v,int) for v in cell) or not (0 <= cell[0] < rows and 0 <= cell[1] < cols):
+            raise ValueError('Goal cell {} is not on the {}x{} grid'.format(list(cell),rows,cols))
+    numbers = sorted(set(v for r in grid for v in r if v != 0))
+    if numbers != list(range(1,len(numbers)+1)):
+        raise ValueError('Blocks must be numbered 1..{}'.format(len(numbers)))
+    if target not in numbers:
+        raise ValueError('Target block {} is not on the grid'.format(target))
     blockList = []
-    for v in range(1,11):
+    for v in numbers:
         blockCells = [(r,c) for c in range(cols) for r in range(rows) if grid[r][c]==v]
-        blockList.append(Block(v,blockCells))
-    blockList[-1].target = True             
-    return KlotskiPuzzle(rows,cols,blockList,grid)
+        blockList.append(Block(v,blockCells,v==target))
+    grid = [list(r) for r in grid]
+    return KlotskiPuzzle(rows,cols,blockList,grid,goalCells)
+
+def BlockAnchor(cells):
+    ''' The anchor of a block is its first cell in row major order '''
+    return min(cells)
+
+def BlockShape(cells):
+    ''' Cells of a block relative to its anchor, identical shapes have identical keys '''
+    r0,c0 = BlockAnchor(cells)
+    return tuple(sorted((r-r0,c-c0) for r,c in cells))
+
+def ShapeClasses(blockList):
+    '''
+    Give every block a class number by its shape (see BlockShape), blocks of
+    identical shapes get the same class (the target block always gets class 0).
+
+    Parameters
+    ----------
+    blockList : list
+        Block objects of a KP.
+
+    Returns
+    -------
+    value_map : dict
+        {block number: class number}, empty cells are mapped to -1.
+    '''
+    value_map = {0: -1}
+    shapes = {}
+    for block in blockList:
+        if block.target:
+            value_map[block.number] = 0
+            continue
+        shape = BlockShape(block.cells)
+        if shape not in shapes:
+            shapes[shape] = len(shapes)+1
+        value_map[block.number] = shapes[shape]
+    return value_map
 
-def GridHashKey(grid):
+def GridHashKey(grid,blockList = None):
     '''
     Creates a unique hash string representing the grid, this is used to quickly
     search for visited states.
@@ -141,13 +281,19 @@ def GridHashKey(grid):
     ----------
     grid : list
         KP grid.
+    blockList : list, optional
+        Block objects of the KP, the shape classes are derived from them.
+        If not given, the classes of the default CreateNewKP grid are used.
 
     Returns
     -------
     hashed : string
-        unique hashed string.
+        unique hashed string (a tuple of shape classes if blockList is given).
 
     '''
+    if blockList != None:
+        value_map = ShapeClasses(blockList)
+        return tuple(value_map[s] for r in grid for s in r)
     value_map = {0: ' ', 1: 'v', 2: 'v', 3: 's', 4: 'v', 5: 'v', 6: 's', 7: 'h', 8: 's',9:'s',10:'t',-2:'e', -1: 'w'}
     chars = [value_map[s] for r in grid for s in r ]
     hashed = ''.join(chars)
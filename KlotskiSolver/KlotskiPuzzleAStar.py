@@ -0,0 +1,196 @@
+'''
+Klotski puzzle optimal solvers,
+unlike the full BFS these stop as soon as the first shortest solution is found:
+    astar - A* search guided by an admissible heuristic
+            (target block distance to the goal + blocking blocks)
+    bidirectional - BFS from the initial state and from all winning states at once,
+            the solution is found where the two searches meet
+            (A* is used instead when there are too many winning states)
+
+Author: Arik Voronov
+Date: 18.10.26
+'''
+import heapq
+from itertools import islice
+from KlotskiPuzzle import *
+from KlotskiState import StateCodec,UnpackMoves
+from KlotskiPuzzleBFS import GetSolutionMoves
+
+MAX_GOALS = 50000 # More winning states than this and the bidirectional search falls back to A*
+
+def AStarSearch(KP,codec=None,counts=None):
+    '''
+    A* search over encoded states.
+    The heuristic is consistent, so the first time a winning state is taken
+    out of the priority queue its path is a shortest one.
+
+    Parameters
+    ----------
+    KP : KlotskiPuzzle object
+        initial state of the puzzle grid.
+    codec : StateCodec object, optional
+        codec of the puzzle layout, created from KP if not given.
+    counts : dict, optional
+        if given, the number of expanded states is stored in counts['expanded'].
+
+    Returns
+    -------
+    path : list
+        [block,action] couples of a shortest solution, None if there is no solution.
+    '''
+    if codec == None:
+        codec = StateCodec(KP)
+    start = codec.Encode(KP)
+    startKey = codec.Canonical(start)
+    parents = {start:(None,None)}
+    distance = {startKey:0} # Symmetric images of a state aren't new states
+    heap = [(codec.Heuristic(start),0,start,startKey)]
+    expanded = 0
+    heappop = heapq.heappop; heappush = heapq.heappush
+    guidedSuccessors = codec.GuidedSuccessors # Keys and heuristics come from the move deltas
+    gameWon = codec.GameWon
+    while heap:
+        f,g,current,key = heappop(heap)
+        g = -g
+        if distance[key] < g: # Already reached with a shorter path
+            continue
+        if gameWon(current):
+            if counts != None:
+                counts['expanded'] = expanded
+            return GetSolutionMoves(KP,current,parents)
+        expanded += 1
+        for move,nextState,nextKey,heuristic in guidedSuccessors(current):
+            known = distance.get(nextKey)
+            if known != None and known <= g+1:
+                continue
+            distance[nextKey] = g+1
+            parents[nextState] = (current,move)
+            # Ties are broken in favor of deeper states
+            heappush(heap,(g+1+heuristic,-(g+1),nextState,nextKey))
+    if counts != None:
+        counts['expanded'] = expanded
+    return None
+
+def BidirectionalSearch(KP,codec=None,counts=None,maxGoals = MAX_GOALS):
+    '''
+    Bidirectional BFS over encoded states, the smaller frontier is expanded
+    one full level at a time until the forward and backward searches meet.
+    Moves are reversible, so the backward search uses the same move generator.
+    The backward search starts from all the winning states, if there are more
+    than maxGoals of them (large boards with many blocks) A* is used instead.
+
+    Parameters
+    ----------
+    KP : KlotskiPuzzle object
+        initial state of the puzzle grid.
+    codec : StateCodec object, optional
+        codec of the puzzle layout, created from KP if not given.
+    counts : dict, optional
+        if given, the number of expanded states is stored in counts['expanded'].
+    maxGoals : int
+        largest number of winning states to start the backward search from.
+
+    Returns
+    -------
+    path : list
+        [block,action] couples of a shortest solution, None if there is no solution.
+    '''
+    if codec == None:
+        codec = StateCodec(KP)
+    start = codec.Encode(KP)
+    if counts != None:
+        counts['expanded'] = 0
+    if codec.GameWon(start):
+        return []
+    goals = list(islice(codec.GoalStates(start),maxGoals+1)) # Generated lazily, stop right after the limit
+    if len(goals) > maxGoals:
+        return AStarSearch(KP,codec,counts)
+    forward = {start:(None,None)} # {state: (parent state, move from parent)}
+    backward = dict.fromkeys(goals,(None,None)) # {state: (next state towards the goal, move to it)}
+    forwardDepth = {start:0}
+    backwardDepth = dict.fromkeys(backward,0)
+    forwardFrontier = [start]
+    backwardFrontier = list(backward)
+    while forwardFrontier and backwardFrontier:
+        expandForward = len(forwardFrontier) <= len(backwardFrontier)
+        if expandForward:
+            frontier,table,depth,otherDepth = forwardFrontier,forward,forwardDepth,backwardDepth
+        else:
+            frontier,table,depth,otherDepth = backwardFrontier,backward,backwardDepth,forwardDepth
+        best = None
+        newFrontier = []
+        if counts != None:
+            counts['expanded'] += len(frontier)
+        for current in frontier:
+            for move,nextState in codec.GetMoves(current):
+                if nextState in depth:
+                    continue
+                depth[nextState] = depth[current]+1
+                if expandForward:
+                    table[nextState] = (current,move)
+                else:
+                    table[nextState] = (current,codec.ReverseMove(move))
+                newFrontier.append(nextState)
+                if nextState in otherDepth:
+                    length = depth[nextState]+otherDepth[nextState]
+                    if best == None or length < best[0]:
+                        best = (length,nextState)
+        if best != None: # The level is complete, so the best meeting point is a shortest path
+            return JoinPaths(KP,best[1],forward,backward)
+        if expandForward:
+            forwardFrontier = newFrontier
+        else:
+            backwardFrontier = newFrontier
+    return None
+
+def JoinPaths(KP,meeting,forward,backward):
+    '''
+    Join the forward path (initial state -> meeting state)
+    and the backward path (meeting state -> winning state)
+
+    Returns
+    -------
+    path : list
+        list of [block,action] couples.
+    '''
+    path = GetSolutionMoves(KP,meeting,forward)
+    for block,action in path:
+        KP = KP.MoveBlock(block,action)
+    moves = []
+    state = meeting
+    while backward[state][0] != None:
+        state,move = backward[state]
+        moves.append(move)
+    return path+UnpackMoves(KP,moves)
+
+def SolveOptimal(KP,mode = 'astar',counts = None):
+    '''
+    Find a single shortest solution, stopping as soon as it's found
+
+    Parameters
+    ----------
+    KP : KlotskiPuzzle object
+        initial state of the puzzle grid.
+    mode : string
+        'astar' or 'bidirectional'.
+    counts : dict, optional
+        if given, the number of expanded states is stored in counts['expanded'].
+
+    Returns
+    -------
+    path : list
+        [block,action] couples of a shortest solution, None if there is no solution.
+    '''
+    if mode == 'astar':
+        return AStarSearch(KP,counts=counts)
+    if mode == 'bidirectional':
+        return BidirectionalSearch(KP,counts=counts)
+    raise ValueError('Unknown search mode: {}'.format(mode))
+
+if __name__ =="__main__":
+    from time import time
+    KP = CreateNewKP(5,4)
+    for mode in ['astar','bidirectional']:
+        t0 = time()
+        path = SolveOptimal(KP,mode)
+        print('{}: shortest path has {} moves ({:.3f} sec)'.format(mode,len(path),time()-t0))
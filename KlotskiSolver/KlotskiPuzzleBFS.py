@@ -8,91 +8,252 @@ Author: Arik Voronov
 Date: 01.03.20
 '''
 
-from KlotskiPuzzle import *        
+from KlotskiPuzzle import *
+from KlotskiState import StateCodec,UnpackMoves
+from KlotskiStats import TimedCodec
 
-def BreadthFirstSearch(KP):
+def IterSolutionStates(KP,codec,parents,stats = None):
+    '''
+    BFS over encoded states (integers), one depth (level) at a time.
+    Every visited state stores only its parent state and the packed move
+    which reached it, paths are rebuilt on request from this table.
+    This is a generator: winning states are yielded as soon as they are found,
+    (shortest first), so the caller may stop the search early.
+
+    Parameters
+    ----------
+    KP : KlotskiPuzzle object
+        initial state of the puzzle grid.
+    codec : StateCodec object
+        codec of the puzzle layout.
+    parents : dict
+        empty dictionary, filled with {state: (parent state, packed move)},
+        the initial state maps to (None,None).
+    stats : SearchStats object, optional
+        gets a record for every finished depth (see KlotskiStats).
+
+    Yields
+    ------
+    state : int
+        winning state.
+    '''
+    if stats != None:
+        stats.Start()
+        codec = TimedCodec(codec,stats)
+    start = codec.Encode(KP)
+    level = [start]
+    visited = {codec.Canonical(start)} # Symmetric images of a state aren't new states
+    parents[start] = (None,None) # Remember which state (and move) reached each node
+    depth = 0
+    successors = codec.Successors # Canonical keys come from the move deltas, next states aren't decoded again
+    gameWon = codec.GameWon
+    while level:
+        nextLevel = []
+        known = len(visited)
+        for current in level:
+            for move,nextState,key in successors(current):
+                if key in visited:
+                    continue
+                # if not in visited, add the canonical key to visited
+                parents[nextState] = (current,move)
+                visited.add(key)
+                if gameWon(nextState): #There's no more branching after the game is won, so don't add it to the next level
+                    yield nextState
+                else:
+                    nextLevel.append(nextState)
+        if stats != None:
+            stats.EndLevel(depth=depth,frontier=len(level),visited=len(visited),
+                           duplicates=stats.generated-(len(visited)-known),
+                           hashSeconds=None) # Keys are derived inside Successors, their time is part of moveGenSeconds
+        level = nextLevel
+        depth += 1
+
+def BuildParentTable(KP,codec=None,stats = None):
+    '''
+    Run the whole BFS (see IterSolutionStates)
+
+    Parameters
+    ----------
+    KP : KlotskiPuzzle object
+        initial state of the puzzle grid.
+    codec : StateCodec object, optional
+        codec of the puzzle layout, created from KP if not given.
+    stats : SearchStats object, optional
+        gets a record for every finished depth (see KlotskiStats).
+
+    Returns
+    -------
+    parents : dict
+        {state: (parent state, packed move)}, the initial state maps to (None,None).
+    solutionStates : list
+        winning states, in the order they were found (shortest first).
+    '''
+    if codec == None:
+        codec = StateCodec(KP)
+    parents = {}
+    solutionStates = list(IterSolutionStates(KP,codec,parents,stats))
+    return parents,solutionStates
+
+def IterSolutionPaths(KP,asMoves = False,stats = None):
+    '''
+    Yield solution paths one at a time, shortest first.
+    Each path is rebuilt from the parent table only when it's reached,
+    so memory doesn't depend on the number of solutions.
+
+    Parameters
+    ----------
+    KP : KlotskiPuzzle object
+        initial state of the puzzle grid.
+    asMoves : bool
+        yield compact [block,action] lists instead of KP lists.
+    stats : SearchStats object, optional
+        gets a record for every finished depth (see KlotskiStats).
+
+    Yields
+    ------
+    path : list
+        KP objects (or [block,action] couples) [intial state ->...-> victory state].
+    '''
+    parents = {}
+    for state in IterSolutionStates(KP,StateCodec(KP),parents,stats):
+        if asMoves:
+            yield GetSolutionMoves(KP,state,parents)
+        else:
+            yield GetSolutionPath(KP,state,parents)
+
+def CountSolutions(KP,shortestOnly = False,stats = None):
+    '''
+    Count the solutions without building any path
+
+    Parameters
+    ----------
+    KP : KlotskiPuzzle object
+        initial state of the puzzle grid.
+    shortestOnly : bool
+        stop at the first (shortest) solution.
+    stats : SearchStats object, optional
+        gets a record for every finished depth (see KlotskiStats).
+
+    Returns
+    -------
+    count : int
+        number of solutions (1 if shortestOnly and the puzzle is solvable).
+    shortest : int
+        number of moves of the shortest solution, None if there is no solution.
+    '''
+    parents = {}
+    count = 0
+    shortest = None
+    for state in IterSolutionStates(KP,StateCodec(KP),parents,stats):
+        if shortest == None:
+            shortest = SolutionLength(state,parents)
+            if shortestOnly:
+                return 1,shortest
+        count += 1
+    return count,shortest
+
+def BreadthFirstSearch(KP,asMoves = False,stats = None):
     '''
-    Stores KP objects as graph nodes,
-    an incomplete graph is created as the function runs.
     Finds all paths to solution using a BFS.
 
     Parameters
     ----------
     KP : KlotskiPuzzle object
         initial state of the puzzle grid.
+    asMoves : bool
+        return the solutions as compact [block,action] lists instead of KP lists.
+    stats : SearchStats object, optional
+        gets a record for every finished depth (see KlotskiStats).
 
     Returns
     -------
     solutionPaths : list 
-        list of lists containing KP objects.
-    '''
-    start = KP
-    queue = []
-    queue.append(start)
-    visited=set(GridHashKey(start.grid))
-    solutionPaths = []
-    while (len(queue)>0):
-        current = queue.pop(0)
-        neighbors = GetNeighbors(current)
-        for nextNode in neighbors:
-            hashed = GridHashKey(nextNode.grid)
-            if hashed in visited:
-                continue
-            # if not in visited, add the hash key (and mirror) to visited
-            nextNode.previousBoard = current # Remember which state reached this node
-            nextNode.distance = current.distance+1
-            visited.add(hashed)
-            visited.add(GridHashKey(MirrorGrid(nextNode.grid))) #Mirror the grid hashkey - that's not a unique new state
-            if nextNode.GameWon(): #There's no more branching after the game is won, so don't add it to the queue
-                solutionPaths.append(GetSolutionPath(nextNode))
-            else:
-                queue.append(nextNode)
-
-    return solutionPaths
-
-def GetNeighbors(KP):
-    '''
-    Get all neighboring states (nodes) to the current KP
+        list of lists containing KP objects (or [block,action] couples).
+    '''
+    return list(IterSolutionPaths(KP,asMoves,stats))
+
+def GetNeighbors(state,codec):
+    '''
+    Get all neighboring states (nodes) to the current encoded state
 
     Parameters
     ----------
-    puzzle : KlotskiPuzzle object
-        current state.
+    state : int
+        current encoded state.
+    codec : StateCodec object
+        codec of the puzzle layout.
 
     Returns
     -------
     neighbors : list
-        list of neighboring KP objects.
+        list of neighboring encoded states.
     '''
-    neighbors =[]
-    valids = KP.GetAllValidActions()
-    for block,action in valids:
-        neighbors.append(KP.MoveBlock(block,action))
-    return neighbors
+    return codec.GetNeighbors(state)
+
+def SolutionLength(state,parents):
+    ''' Number of moves leading to the input state '''
+    length = 0
+    state = parents[state][0]
+    while state != None:
+        length += 1
+        state = parents[state][0]
+    return length
 
-def GetSolutionPath(KP):
+def GetSolutionMoves(KP,state,parents):
     '''
-    Get the path to the input KP, untill reaches the initial state (no parent)
+    Get the moves leading to the input state, untill reaches the initial state (no parent)
 
     Parameters
     ----------
-    board : KlotskiPuzzle object
-        last state in the path.
+    KP : KlotskiPuzzle object
+        initial state of the puzzle grid.
+    state : int
+        last encoded state in the path.
+    parents : dict
+        {state: (parent state, packed move)} of all visited states.
+
+    Returns
+    -------
+    path : list
+        list of [block,action] couples [intial state ->...-> input state].
+    '''
+    moves = []
+    state,move = parents[state]
+    while state != None:
+        moves.append(move)
+        state,move = parents[state]
+    moves.reverse()
+    return UnpackMoves(KP,moves)
+
+def GetSolutionPath(KP,state,parents):
+    '''
+    Get the path to the input state, untill reaches the initial state (no parent)
+
+    Parameters
+    ----------
+    KP : KlotskiPuzzle object
+        initial state of the puzzle grid.
+    state : int
+        last encoded state in the path.
+    parents : dict
+        {state: (parent state, packed move)} of all visited states.
 
     Returns
     -------
     path : list
         list of KP objects [intial state ->...-> input state] (intial first).
     '''
-    path = []
-    while KP != None:
-        path.insert(0,KP)
-        KP = KP.previousBoard
+    path = [KP]
+    for block,action in GetSolutionMoves(KP,state,parents):
+        nextKP = KP.MoveBlock(block,action)
+        nextKP.previousBoard = KP
+        nextKP.distance = KP.distance+1
+        path.append(nextKP)
+        KP = nextKP
     return path
 
 if __name__ =="__main__":
     KP = CreateNewKP(5,4)
-    solutionPaths = BreadthFirstSearch(KP)
-    pathLengths = [i for i in map(len,solutionPaths)]
-    print('Found {} unique solution paths'.format(len(solutionPaths)))
-    print('Shortest path has {} steps'.format(min(pathLengths)))
+    count,shortest = CountSolutions(KP)
+    print('Found {} unique solution paths'.format(count))
+    print('Shortest path has {} steps'.format(shortest+1)) # Including the initial state
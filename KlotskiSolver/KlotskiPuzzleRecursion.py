@@ -1,65 +1,166 @@
 '''
 Klotski puzzle solver,
-Using backtracking recursion, move through all valid states,
-At each state of the puzzle, move every valid block/action
-when the winning position is obtained, 
-the recursion back tracks and stores the path to that point
+Iterative deepening A* (IDA*) with an explicit stack instead of recursion:
+depth first searches are repeated with a growing bound on
+(moves made + heuristic estimate of the moves left), so the first solution
+found is a shortest one.
+The KP is moved in place (make/unmake moves) while the moves, state keys and
+heuristics come from the encoded states (StateCodec), and a bounded transposition
+table keeps the fewest moves a state was reached with over all the iterations,
+so a state reached again with more moves isn't searched again.
+Memory is proportional to the depth and the table size and not to the number of
+visited states, and python's recursion limit is never reached.
 
 Author: Arik Voronov
 Date: 01.03.20
 '''
 
 from KlotskiPuzzle import *
+from KlotskiState import StateCodec,HashState
+from KlotskiStats import TimedCodec,CountedTable
 
-def SolveKlotski(KP,visited,path):
+class TranspositionTable():
     '''
-    Backtracking recursive solution for KP
+    Fixed size table of {state: [lower bound, fewest moves, iteration]},
+    a state can be stored in two slots, a new state replaces the one of the two
+    which was reached with more moves (states near the root are worth more).
+    '''
+    def __init__(self,size):
+        self.size = size
+        self.keys = [None]*size
+        self.values = [None]*size
+    def Get(self,key):
+        ''' Entry stored for a key, None if it isn't stored '''
+        slot = (HashState(key)>>16) % self.size
+        if self.keys[slot] == key:
+            return self.values[slot]
+        slot ^= 1
+        if self.keys[slot] == key:
+            return self.values[slot]
+        return None
+    def Put(self,key,value):
+        slot = (HashState(key)>>16) % self.size
+        other = slot^1
+        if self.keys[slot] != key and (self.keys[other] == key or
+                                       (self.keys[slot] != None and (self.keys[other] == None or self.values[other][1] > self.values[slot][1]))):
+            slot = other
+        self.keys[slot] = key
+        self.values[slot] = value
+
+def SolveKlotski(KP,path,tableSize = 2**18,stats = None):
+    '''
+    Iterative IDA* solution for KP.
+    The transposition table remembers for every state:
+        lower bound - moves left to win, raised when a search under the state fails
+        fewest moves - moves of the shortest path the state was reached with, in any iteration,
+                       a state reached with more moves is skipped (a shorter solution
+                       through it would have ended an earlier iteration)
+        iteration - when the state was last searched, a state reached again in the
+                    same iteration with as many moves is skipped
+    The lower bound of a state becomes the smallest (1 + lower bound) of its children,
+    skipped children included, so the bounds stay admissible.
    
     Parameters
     ----------
     KP : Klotski Puzzle object
-        current state of KP.
-    visited : set
-        grid states already visited during this recursion.
+        initial state of KP, moved in place and restored before returning.
     path : list
         [block,action] couples, intial state ->...-> victory state
-        initialized as an empty list)
+        (initialized as an empty list)
+    tableSize : int
+        number of transposition table entries.
+    stats : SearchStats object, optional
+        gets a record for every finished iteration (see KlotskiStats),
+        duplicates are the transposition table hits.
 
     Returns
     -------
     bool
         True if reached the victory KP state.
     '''
-    if KP.GameWon():
+    codec = StateCodec(KP)
+    table = TranspositionTable(tableSize)
+    if stats != None:
+        stats.Start()
+        codec = TimedCodec(codec,stats)
+        table = CountedTable(table,stats)
+    state = codec.Encode(KP)
+    if codec.GameWon(state):
         return True
-    valids = KP.GetAllValidActions() # [block,action pairs of all possible actions in state]
-    neighbors = [] # List neighboring KP objects
-    for block,action in valids:
-        newKP = KP.MoveBlock(block,action)
-        hashed = GridHashKey(newKP.grid)
-        if hashed in visited: # If the new state has been visited before - reverse
-            continue
-        else:
-            neighbors.append(newKP)
-            visited.add(hashed)
-            visited.add(GridHashKey(MirrorGrid(newKP.grid)))
-    for newKP in neighbors:
-        won = SolveKlotski(newKP,visited,path)
-        if won: # Keep returning True and exit the recursion completely in the current state
-            path.append([block,action])
-            return True
+    # The codec generates the moves, the block numbers of the moves are read from the KP grid
+    cols = KP.cols
+    rootKey = codec.Canonical(state)
+    rootEntry = [codec.Heuristic(state),0,0]
+    bound = rootEntry[0]
+    iteration = 0
+    while bound != None:
+        iteration += 1
+        rootEntry[2] = iteration
+        table.Put(rootKey,rootEntry)
+        nextBound = None # Smallest f which exceeds the bound
+        # Frame: [successors (see StateCodec.GuidedSuccessors), index of the next one, depth,
+        #         smallest (1 + lower bound) of the children, table entry of the state]
+        stack = [[codec.GuidedSuccessors(state),0,0,None,rootEntry]]
+        moves = []
+        while True:
+            frame = stack[-1]
+            successors,index,depth,lowest,entry = frame
+            if index == len(successors): # All the moves were tried - backtrack
+                stack.pop()
+                if lowest != None and lowest > entry[0]:
+                    entry[0] = lowest
+                if not stack:
+                    if stats != None:
+                        stats.EndLevel(iteration=iteration,bound=bound)
+                    bound = nextBound
+                    break
+                parent = stack[-1]
+                if parent[3] == None or entry[0]+1 < parent[3]:
+                    parent[3] = entry[0]+1
+                moves.pop()
+                KP.UnmakeMove()
+                continue
+            frame[1] += 1
+            move,nextState,nextKey,heuristic = successors[index]
+            anchor,action = divmod(move,4)
+            block = KP.grid[anchor//cols][anchor%cols]
+            if codec.GameWon(nextState):
+                moves.append([block,action])
+                path.extend(moves)
+                for _ in moves[:-1]: # Restore the initial state
+                    KP.UnmakeMove()
+                if stats != None:
+                    stats.EndLevel(iteration=iteration,bound=bound)
+                return True
+            nextEntry = table.Get(nextKey)
+            if nextEntry == None:
+                nextEntry = [heuristic,depth+1,0]
+                table.Put(nextKey,nextEntry)
+            elif nextEntry[1] > depth+1:
+                nextEntry[1] = depth+1
+            elif nextEntry[1] < depth+1 or nextEntry[2] == iteration:
+                # Reached with fewer moves, or already searched in this iteration,
+                # its stored bound still limits the bound of the current state
+                if frame[3] == None or nextEntry[0]+1 < frame[3]:
+                    frame[3] = nextEntry[0]+1
+                continue
+            f = depth+1+nextEntry[0]
+            if f > bound:
+                if frame[3] == None or nextEntry[0]+1 < frame[3]:
+                    frame[3] = nextEntry[0]+1
+                if nextBound == None or f < nextBound:
+                    nextBound = f
+                continue
+            nextEntry[2] = iteration
+            moves.append([block,action])
+            KP.MakeMove(block,action)
+            stack.append([codec.GuidedSuccessors(nextState),0,depth+1,None,nextEntry])
     return False
 
 
-
 if __name__ =="__main__":
-    import sys
-    sys.setrecursionlimit(5000) # Default value is 1000
     KP = CreateNewKP(5,4)
     KP.RenderInConsole()
-    visited = set()
     path = []
-    SolveKlotski(KP,visited,path)
+    SolveKlotski(KP,path)
     print('Found a solution path which has {} steps'.format(len(path)))
-
-
@@ -0,0 +1,528 @@
+'''
+Compact integer encoding of Klotski puzzle states.
+Every cell of the grid gets a few bits of a single python integer:
+    0 - empty cell
+    1 - cell covered by a block (but not its anchor)
+    2.. - anchor (top left cell) of a block, the code is the block's shape class
+Blocks of identical shapes get the same shape class (the target block always
+has its own class), so interchangeable blocks produce the same state.
+Moves and the winning condition are computed directly on the integers using
+tables which are prepared once per layout.
+
+Author: Arik Voronov
+Date: 18.10.26
+'''
+from KlotskiPuzzle import *
+
+def HashState(state):
+    '''
+    Well mixed 64 bit hash of an encoded state,
+    the low bits of a state only describe the first cells so they can't be used directly.
+    '''
+    return ((state^(state>>29))*0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+
+class StateCodec():
+    '''
+    Encodes KP objects to integers and generates moves on the encoded states.
+    The codec is created once per layout (board dimensions, block shapes and goal).
+    '''
+    def __init__(self,KP):
+        self.rows = KP.rows
+        self.cols = KP.cols
+        self.cellCount = KP.rows*KP.cols
+        self.actionKeys = [(-1,0),(0,1),(1,0),(0,-1)]
+        # Shape classes, the target block gets a class of its own
+        self.shapes = []
+        self.blockClass = {}
+        self.targetClass = None
+        for block in KP.blockList:
+            if block.target:
+                self.shapes.append(BlockShape(block.cells))
+                self.targetClass = 0
+                self.blockClass[block.number] = 0
+                break
+        firstShared = len(self.shapes)
+        for block in KP.blockList:
+            if block.target:
+                continue
+            shape = BlockShape(block.cells)
+            if shape not in self.shapes[firstShared:]:
+                self.shapes.append(shape)
+            self.blockClass[block.number] = self.shapes.index(shape,firstShared)
+        self.classCounts = [list(self.blockClass.values()).count(k) for k in range(len(self.shapes))]
+        self.bits = max(2,(len(self.shapes)+1).bit_length())
+        self.codeMask = (1<<self.bits)-1
+        self.PrepareTables()
+        self.PrepareGoal(KP.goalCells)
+        self.PrepareSymmetries()
+        self.PrepareDecoding()
+
+    def Cell(self,r,c):
+        ''' Index of a grid cell inside the state '''
+        return r*self.cols+c
+
+    def Cells(self,shapeClass,anchor):
+        ''' Grid cells of a block of the given class at the given anchor, None if out of bounds '''
+        r0,c0 = divmod(anchor,self.cols)
+        cells = []
+        for dr,dc in self.shapes[shapeClass]:
+            r = r0+dr; c = c0+dc
+            if r<0 or r>=self.rows or c<0 or c>=self.cols:
+                return None
+            cells.append((r,c))
+        return cells
+
+    def PrepareTables(self):
+        '''
+        For every shape class and anchor prepare:
+        cellMask - bit mask of the cells covered by the block
+        codeValue - the block's contribution to the encoded state
+        moves - list of (action, new anchor, newly covered cells mask, state delta)
+        '''
+        self.cellMask = []
+        self.codeValue = []
+        for k in range(len(self.shapes)):
+            masks = [None]*self.cellCount
+            values = [None]*self.cellCount
+            for anchor in range(self.cellCount):
+                cells = self.Cells(k,anchor)
+                if cells == None:
+                    continue
+                mask = 0
+                value = 0
+                for r,c in cells:
+                    cell = self.Cell(r,c)
+                    mask |= 1<<cell
+                    code = k+2 if cell == anchor else 1
+                    value += code<<(self.bits*cell)
+                masks[anchor] = mask
+                values[anchor] = value
+            self.cellMask.append(masks)
+            self.codeValue.append(values)
+        self.moves = []
+        for k in range(len(self.shapes)):
+            classMoves = [[] for _ in range(self.cellCount)]
+            for anchor in range(self.cellCount):
+                if self.cellMask[k][anchor] == None:
+                    continue
+                r0,c0 = divmod(anchor,self.cols)
+                for action,shift in enumerate(self.actionKeys):
+                    r = r0+shift[0]; c = c0+shift[1]
+                    if r<0 or r>=self.rows or c<0 or c>=self.cols:
+                        continue
+                    newAnchor = self.Cell(r,c)
+                    if self.cellMask[k][newAnchor] == None:
+                        continue
+                    newCells = self.cellMask[k][newAnchor] & ~self.cellMask[k][anchor]
+                    delta = self.codeValue[k][newAnchor]-self.codeValue[k][anchor]
+                    classMoves[anchor].append((action,newAnchor,newCells,delta))
+            self.moves.append(classMoves)
+
+    def PrepareGoal(self,goalCells):
+        ''' Anchors of the target block in which it covers all the goal cells '''
+        goalMask = 0
+        for r,c in goalCells:
+            goalMask |= 1<<self.Cell(r,c)
+        self.goalMask = goalMask
+        self.winAnchors = []
+        if self.targetClass == None:
+            return
+        for anchor,mask in enumerate(self.cellMask[self.targetClass]):
+            if mask != None and mask & goalMask == goalMask:
+                self.winAnchors.append(anchor)
+        self.PrepareHeuristic()
+
+    def ShiftDistances(self,k,sources):
+        ''' Fewest moves of a lone class k block from every anchor to the nearest source anchor (None if it can't get there) '''
+        distances = [None]*self.cellCount
+        level = list(sources)
+        for anchor in level:
+            distances[anchor] = 0
+        while level:
+            nextLevel = []
+            for anchor in level:
+                for action,newAnchor,newCells,delta in self.moves[k][anchor]:
+                    if distances[newAnchor] == None:
+                        distances[newAnchor] = distances[anchor]+1
+                        nextLevel.append(newAnchor)
+            level = nextLevel
+        return distances
+
+    def PrepareHeuristic(self):
+        '''
+        Lower bound of the moves of every block (class,anchor), Heuristic sums them up:
+        target - moves to the nearest winning anchor,
+        other blocks - moves out of the cells the target covers in every winning position.
+        Each block's own moves are counted (and a move changes a single block's bound by at most 1),
+        so the sum is admissible and consistent.
+        '''
+        self.footprint = 0
+        if self.winAnchors:
+            self.footprint = (1<<self.cellCount)-1
+            for anchor in self.winAnchors:
+                self.footprint &= self.cellMask[self.targetClass][anchor]
+        self.heuristicValue = []
+        for k in range(len(self.shapes)):
+            if k == self.targetClass:
+                sources = self.winAnchors
+            else:
+                sources = [anchor for anchor,mask in enumerate(self.cellMask[k]) if mask != None and not mask & self.footprint]
+            distances = self.ShiftDistances(k,sources)
+            # A block which can never get there makes the layout unsolvable, any bound is fine
+            self.heuristicValue.append([distance or 0 for distance in distances])
+
+    def SymmetryMaps(self):
+        ''' Cell transformations of the board's symmetries (except the identity) '''
+        R = self.rows-1; C = self.cols-1
+        maps = {'mirror':lambda r,c: (r,C-c),
+                'flip':lambda r,c: (R-r,c),
+                'rotate180':lambda r,c: (R-r,C-c)}
+        if self.rows == self.cols: # Square boards have 4 more symmetries
+            maps['transpose'] = lambda r,c: (c,r)
+            maps['antitranspose'] = lambda r,c: (C-c,R-r)
+            maps['rotate90'] = lambda r,c: (c,R-r)
+            maps['rotate270'] = lambda r,c: (C-c,r)
+        return maps
+
+    def ImageClass(self,k,shape):
+        ''' Class of the image of a class k block with the given shape, None if there isn't an interchangeable class '''
+        if k == self.targetClass:
+            return k if shape == self.shapes[k] else None
+        for imageClass,classShape in enumerate(self.shapes):
+            if imageClass != self.targetClass and classShape == shape and self.classCounts[imageClass] == self.classCounts[k]:
+                return imageClass
+        return None
+
+    def SymmetryValues(self,transform):
+        '''
+        Map every block (class,anchor) to the code value of its image under a cell transformation,
+        returns None if the transformation isn't a symmetry of the layout.
+        '''
+        values = []
+        for k in range(len(self.shapes)):
+            values.append([None]*self.cellCount)
+            for anchor in range(self.cellCount):
+                cells = self.Cells(k,anchor)
+                if cells == None:
+                    continue
+                image = [transform(r,c) for r,c in cells]
+                imageClass = self.ImageClass(k,BlockShape(image))
+                if imageClass == None:
+                    return None
+                values[k][anchor] = self.codeValue[imageClass][self.Cell(*BlockAnchor(image))]
+        if self.targetClass != None: # Winning positions must map to winning positions
+            winValues = [self.codeValue[self.targetClass][anchor] for anchor in self.winAnchors]
+            winImages = [values[self.targetClass][anchor] for anchor in self.winAnchors]
+            if sorted(winImages) != sorted(winValues):
+                return None
+        return values
+
+    def PrepareSymmetries(self):
+        '''
+        Find the board symmetries which are also symmetries of the layout:
+        every shape class must map to a class with the same number of blocks,
+        the target block must map to itself and winning positions to winning positions.
+        The images of a state are then summed up while its blocks are decoded.
+        '''
+        self.symmetryNames = []
+        self.symmetryValues = []
+        for name,transform in self.SymmetryMaps().items():
+            values = self.SymmetryValues(transform)
+            if values != None:
+                self.symmetryNames.append(name)
+                self.symmetryValues.append(values)
+
+    def PrepareDecoding(self):
+        '''
+        States are decoded a chunk of cells at a time (up to 12 bits) instead of cell by cell,
+        the decoding of every chunk value at every chunk position is computed on its first use.
+        '''
+        self.chunkCells = max(1,12//self.bits)
+        self.chunkBits = self.chunkCells*self.bits
+        self.chunkMask = (1<<self.chunkBits)-1
+        self.chunkTables = [{} for _ in range(0,self.cellCount,self.chunkCells)]
+
+    def DecodeChunk(self,position,chunk):
+        '''
+        Decoding of a chunk value at a chunk position
+
+        Returns
+        -------
+        occupied : int
+            bit mask of the occupied cells of the chunk.
+        blocks : list
+            (shape class, anchor) couples of the blocks anchored in the chunk.
+        candidates : list
+            (packed move, newly covered cells mask, state delta, image deltas, heuristic delta)
+            of the moves of these blocks which aren't blocked inside the chunk, the move is legal
+            if the newly covered cells are empty.
+        images : list
+            the blocks' contribution to every image of the state (see Images).
+        heuristic : int
+            the blocks' contribution to the heuristic (see Heuristic).
+        '''
+        occupied = 0
+        blocks = []
+        candidates = []
+        images = [0]*len(self.symmetryValues)
+        heuristic = 0
+        first = position*self.chunkCells
+        for offset in range(self.chunkCells):
+            code = (chunk>>(self.bits*offset)) & self.codeMask
+            if not code:
+                continue
+            anchor = first+offset
+            occupied |= 1<<anchor
+            if code == 1:
+                continue
+            k = code-2
+            blocks.append((k,anchor))
+            for i,values in enumerate(self.symmetryValues):
+                images[i] += values[k][anchor]
+            heuristic += self.heuristicValue[k][anchor]
+            for action,newAnchor,newCells,delta in self.moves[k][anchor]:
+                imageDeltas = tuple(values[k][newAnchor]-values[k][anchor] for values in self.symmetryValues)
+                heuristicDelta = self.heuristicValue[k][newAnchor]-self.heuristicValue[k][anchor]
+                candidates.append((anchor*4+action,newCells,delta,imageDeltas,heuristicDelta))
+        # Moves into cells which are occupied inside the chunk itself are never legal
+        candidates = [candidate for candidate in candidates if not candidate[1] & occupied]
+        entry = (occupied,blocks,candidates,images,heuristic)
+        self.chunkTables[position][chunk] = entry
+        return entry
+
+    def Decode(self,state):
+        '''
+        Decode a state chunk by chunk
+
+        Returns
+        -------
+        occupied, blocks, candidates, images, heuristic
+            as in DecodeChunk, for the whole state.
+        '''
+        occupied = 0
+        blocks = []
+        candidates = []
+        images = None
+        heuristic = 0
+        chunkBits = self.chunkBits; chunkMask = self.chunkMask
+        position = 0
+        for table in self.chunkTables:
+            chunk = state & chunkMask
+            entry = table.get(chunk)
+            if entry == None:
+                entry = self.DecodeChunk(position,chunk)
+            occupied |= entry[0]
+            blocks += entry[1]
+            candidates += entry[2]
+            if images == None:
+                images = list(entry[3]) # Cached entries are never changed
+            elif entry[3]:
+                images = [image+value for image,value in zip(images,entry[3])]
+            heuristic += entry[4]
+            state >>= chunkBits
+            position += 1
+        return occupied,blocks,candidates,images,heuristic
+
+    def Encode(self,KP):
+        ''' Encode a KP object as an integer state '''
+        state = 0
+        for block in KP.blockList:
+            state += self.codeValue[self.blockClass[block.number]][self.Cell(*BlockAnchor(block.cells))]
+        return state
+
+    def Blocks(self,state):
+        '''
+        Decode the blocks of a state
+
+        Returns
+        -------
+        blocks : list
+            (shape class, anchor) couples.
+        occupied : int
+            bit mask of the occupied cells.
+        '''
+        occupied,blocks,candidates,images,heuristic = self.Decode(state)
+        return blocks,occupied
+
+    def GetNeighbors(self,state):
+        ''' Get all states which are one legal move away from the input state '''
+        occupied,blocks,candidates,images,heuristic = self.Decode(state)
+        return [state+delta for move,newCells,delta,imageDeltas,heuristicDelta in candidates if not newCells & occupied]
+
+    def GetMoves(self,state):
+        '''
+        Get all legal moves in the input state
+
+        Returns
+        -------
+        moves : list
+            (move, next state) couples, move is packed as anchor*4+action.
+        '''
+        occupied,blocks,candidates,images,heuristic = self.Decode(state)
+        return [(move,state+delta) for move,newCells,delta,imageDeltas,heuristicDelta in candidates if not newCells & occupied]
+
+    def DecodeSingle(self,state):
+        '''
+        Decode (see Decode) for layouts with a single symmetry (e.g. the classic layout is only
+        mirror symmetric), returns occupied, candidates, image, heuristic
+        '''
+        occupied = 0
+        candidates = []
+        image = 0
+        heuristic = 0
+        position = 0
+        chunkBits = self.chunkBits; chunkMask = self.chunkMask
+        for table in self.chunkTables:
+            entry = table.get(state & chunkMask)
+            if entry == None:
+                entry = self.DecodeChunk(position,state & chunkMask)
+            occupied |= entry[0]
+            candidates += entry[2]
+            image += entry[3][0]
+            heuristic += entry[4]
+            state >>= chunkBits
+            position += 1
+        return occupied,candidates,image,heuristic
+
+    def Successors(self,state):
+        '''
+        Get all legal moves in the input state with the canonical keys of the next states,
+        the state is decoded once and the images of every next state are updated
+        from the move deltas (instead of decoding every next state again in Canonical).
+        It's GuidedSuccessors without the heuristics, so both always agree on the moves and keys.
+
+        Returns
+        -------
+        successors : list
+            (move, next state, canonical key of the next state) triplets.
+        '''
+        return [(move,nextState,key) for move,nextState,key,heuristic in self.GuidedSuccessors(state)]
+
+    def GameWon(self,state):
+        ''' Check if the target block covers the goal cells '''
+        targetCode = self.targetClass+2 if self.targetClass != None else None
+        for anchor in self.winAnchors:
+            if (state>>(self.bits*anchor)) & self.codeMask == targetCode:
+                return True
+        return False
+
+    def Heuristic(self,state):
+        '''
+        Admissible (and consistent) estimate of the moves left to win:
+        moves of the target block to its nearest winning anchor, plus the moves every other block
+        needs to get out of the target's final cells (see PrepareHeuristic).
+        '''
+        return self.Decode(state)[4]
+
+    def GuidedSuccessors(self,state):
+        '''
+        Successors (see Successors) with the heuristic of the next states, updated from the move deltas
+
+        Returns
+        -------
+        successors : list
+            (move, next state, canonical key of the next state, heuristic of the next state).
+        '''
+        result = []
+        if len(self.symmetryValues) != 1:
+            occupied,blocks,candidates,images,heuristic = self.Decode(state)
+            for move,newCells,delta,imageDeltas,heuristicDelta in candidates:
+                if not newCells & occupied:
+                    nextState = state+delta
+                    key = min([nextState]+[image+imageDelta for image,imageDelta in zip(images,imageDeltas)]) if images else nextState
+                    result.append((move,nextState,key,heuristic+heuristicDelta))
+            return result
+        occupied,candidates,image,heuristic = self.DecodeSingle(state)
+        for move,newCells,delta,imageDeltas,heuristicDelta in candidates:
+            if not newCells & occupied:
+                nextState = state+delta
+                nextImage = image+imageDeltas[0]
+                result.append((move,nextState,nextImage if nextImage < nextState else nextState,heuristic+heuristicDelta))
+        return result
+
+    def ReverseMove(self,move):
+        ''' The packed move which undoes the input packed move '''
+        anchor,action = divmod(move,4)
+        shift = self.actionKeys[action]
+        return (anchor+shift[0]*self.cols+shift[1])*4+ReverseAction(action)
+
+    def GoalStates(self,state):
+        '''
+        Generate all the winning states made of the same blocks as the input state,
+        (including states which can't be reached from it), one at a time -
+        there may be millions of them on large boards, so callers take only as many as they need.
+        '''
+        blocks,occupied = self.Blocks(state)
+        counts = [0]*len(self.shapes)
+        for k,anchor in blocks:
+            if k != self.targetClass:
+                counts[k] += 1
+        empties = self.cellCount-bin(occupied).count('1')
+        def Place(cell,occupied,state,empties):
+            # Every cell before 'cell' is either occupied or left empty
+            while cell<self.cellCount and occupied>>cell & 1:
+                cell += 1
+            if cell == self.cellCount:
+                yield state
+                return
+            if empties:
+                yield from Place(cell+1,occupied,state,empties-1)
+            for k in range(len(self.shapes)):
+                if counts[k] == 0:
+                    continue
+                mask = self.cellMask[k][cell]
+                if mask == None or mask & occupied:
+                    continue
+                counts[k] -= 1
+                yield from Place(cell+1,occupied|mask,state+self.codeValue[k][cell],empties)
+                counts[k] += 1
+        for anchor in self.winAnchors:
+            yield from Place(0,self.cellMask[self.targetClass][anchor],self.codeValue[self.targetClass][anchor],empties)
+
+    def Images(self,state):
+        ''' Images of a state under all the symmetries of the layout '''
+        return self.Decode(state)[3]
+
+    def Canonical(self,state):
+        '''
+        A single key for all the symmetric images of a state (the smallest one),
+        computed in a single pass over the state's chunks.
+        '''
+        if not self.symmetryValues:
+            return state
+        return min([state]+self.Decode(state)[3])
+
+    def Grid(self,state):
+        ''' Shape class grid of a state (empty cells are -1), useful for rendering '''
+        grid = [[-1]*self.cols for _ in range(self.rows)]
+        for k,anchor in self.Blocks(state)[0]:
+            for r,c in self.Cells(k,anchor):
+                grid[r][c] = k
+        return grid
+
+def UnpackMoves(KP,moves):
+    '''
+    Convert packed moves to [block,action] couples,
+    block numbers are lost in the encoding so they are read from the KP grid
+    while replaying the moves.
+
+    Parameters
+    ----------
+    KP : KlotskiPuzzle object
+        state in which the first move is made.
+    moves : list
+        packed moves (anchor*4+action).
+
+    Returns
+    -------
+    path : list
+        list of [block,action] couples.
+    '''
+    path = []
+    for move in moves:
+        anchor,action = divmod(move,4)
+        r,c = divmod(anchor,KP.cols)
+        block = KP.grid[r][c]
+        path.append([block,action])
+        KP = KP.MoveBlock(block,action)
+    return path
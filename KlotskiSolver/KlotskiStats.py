@@ -0,0 +1,173 @@
+'''
+Search instrumentation for the Klotski solvers.
+A SearchStats object is passed to a solver (BreadthFirstSearch, SolveKlotski...)
+which then reports every finished BFS depth (or IDA* iteration).
+The solver wraps its move generator, codec and transposition table with timed
+versions only when it is given a SearchStats object, so the hot loops of an
+uninstrumented search are left exactly as they are.
+
+Every level record holds:
+    the solver's own fields (e.g. depth, frontier, visited)
+    expanded, generated - states expanded and successors generated in this level
+    duplicates, duplicateRate - successors which were already visited (or transposition table hits)
+    seconds, nodesPerSec - time of this level and expanded states per second
+    moveGenSeconds, hashSeconds - time spent generating moves / computing state keys and probing tables,
+        hashSeconds is None for solvers which get the keys from the move generator (BFS)
+    peakRSS - peak resident memory of the process in bytes (None if not available)
+
+Author: Arik Voronov
+Date: 18.10.26
+'''
+import json
+import sys
+from time import perf_counter
+try:
+    import resource
+except ImportError: # Not available on windows
+    resource = None
+
+def PeakRSS():
+    ''' Peak resident memory of the process in bytes, None if it can't be measured '''
+    if resource == None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin': # Already in bytes
+        return peak
+    return peak*1024
+
+class SearchStats():
+    '''
+    Collects per level statistics of a search
+
+    Parameters
+    ----------
+    callback : function, optional
+        called with every level record as soon as the level is finished.
+    '''
+    def __init__(self,callback = None):
+        self.callback = callback
+        self.levels = []
+        self.Reset()
+
+    def Reset(self):
+        ''' Zero the counters of the current level '''
+        self.expanded = 0
+        self.generated = 0
+        self.duplicates = None # Solvers which can't count duplicates leave it as None
+        self.lookups = 0
+        self.moveGenSeconds = 0.0
+        self.hashSeconds = 0.0
+        self.levelStart = perf_counter()
+
+    def Start(self):
+        ''' Called by the solver when the search starts '''
+        self.searchStart = perf_counter()
+        self.Reset()
+
+    def EndLevel(self,**fields):
+        '''
+        Called by the solver when a level is finished,
+        fields are the solver's own fields (e.g. depth, frontier size).
+        '''
+        seconds = perf_counter()-self.levelStart
+        record = dict(fields)
+        record['expanded'] = self.expanded
+        record['generated'] = self.generated
+        duplicates = fields.get('duplicates',self.duplicates)
+        lookups = self.lookups if self.lookups else self.generated
+        record['duplicates'] = duplicates
+        record['duplicateRate'] = round(duplicates/lookups,4) if duplicates != None and lookups else None
+        record['seconds'] = round(seconds,6)
+        record['nodesPerSec'] = round(self.expanded/seconds,1) if seconds > 0 else None
+        record['moveGenSeconds'] = round(self.moveGenSeconds,6)
+        hashSeconds = fields.get('hashSeconds',self.hashSeconds)
+        record['hashSeconds'] = round(hashSeconds,6) if hashSeconds != None else None
+        record['peakRSS'] = PeakRSS()
+        self.levels.append(record)
+        if self.callback != None:
+            self.callback(record)
+        self.Reset()
+
+    def Summary(self):
+        ''' Totals over all the levels '''
+        expanded = sum(level['expanded'] for level in self.levels)
+        seconds = perf_counter()-self.searchStart
+        return {'levels':len(self.levels),
+                'expanded':expanded,
+                'generated':sum(level['generated'] for level in self.levels),
+                'seconds':round(seconds,6),
+                'nodesPerSec':round(expanded/seconds,1) if seconds > 0 else None,
+                'moveGenSeconds':round(sum(level['moveGenSeconds'] for level in self.levels),6),
+                'hashSeconds':self.TotalHashSeconds(),
+                'peakRSS':PeakRSS()}
+
+    def TotalHashSeconds(self):
+        ''' Sum of the levels' hashSeconds, None if no level measured it '''
+        measured = [level['hashSeconds'] for level in self.levels if level['hashSeconds'] != None]
+        if self.levels and not measured:
+            return None
+        return round(sum(measured),6)
+
+    def Dump(self,file):
+        ''' Write the summary and all the level records as JSON to a path or an open file '''
+        data = {'summary':self.Summary(),'levels':self.levels}
+        if isinstance(file,str):
+            with open(file,'w') as f:
+                json.dump(data,f,indent=1)
+        else:
+            json.dump(data,file,indent=1)
+
+    def TimedMoves(self,function):
+        ''' Wrap a move generator, each call is an expanded state and its result are the generated moves '''
+        def Wrapper(*args):
+            t0 = perf_counter()
+            result = function(*args)
+            self.moveGenSeconds += perf_counter()-t0
+            self.expanded += 1
+            self.generated += len(result)
+            return result
+        return Wrapper
+
+    def TimedHash(self,function):
+        ''' Wrap a function which computes state keys '''
+        def Wrapper(*args):
+            t0 = perf_counter()
+            result = function(*args)
+            self.hashSeconds += perf_counter()-t0
+            return result
+        return Wrapper
+
+class TimedCodec():
+    '''
+    StateCodec proxy which reports move generation and key computation times to a SearchStats object
+    '''
+    def __init__(self,codec,stats):
+        self.codec = codec
+        self.GetMoves = stats.TimedMoves(codec.GetMoves)
+        self.Successors = stats.TimedMoves(codec.Successors)
+        self.GuidedSuccessors = stats.TimedMoves(codec.GuidedSuccessors)
+        self.Canonical = stats.TimedHash(codec.Canonical)
+    def __getattr__(self,name):
+        return getattr(self.codec,name)
+
+class CountedTable():
+    '''
+    Transposition table proxy which counts lookups and hits (as duplicates) in a SearchStats object,
+    the solver must call Get only for generated successors, so the hits are never more than the successors
+    '''
+    def __init__(self,table,stats):
+        self.table = table
+        self.stats = stats
+    def Get(self,key):
+        t0 = perf_counter()
+        entry = self.table.Get(key)
+        stats = self.stats
+        stats.hashSeconds += perf_counter()-t0
+        stats.lookups += 1
+        if entry != None:
+            if stats.duplicates == None:
+                stats.duplicates = 0
+            stats.duplicates += 1
+        return entry
+    def Put(self,key,value):
+        self.table.Put(key,value)
@@ -0,0 +1,199 @@
+'''
+Tests of the Klotski solvers, run with pytest from this directory.
+Expected solution counts and lengths are those of the original BFS over KP objects.
+
+Author: Arik Voronov
+Date: 18.10.26
+'''
+import random
+import pytest
+from KlotskiPuzzle import *
+from KlotskiState import StateCodec,BlockAnchor,UnpackMoves
+from KlotskiPuzzleBFS import BreadthFirstSearch,CountSolutions
+from KlotskiPuzzleAStar import AStarSearch,BidirectionalSearch
+from KlotskiPuzzleRecursion import SolveKlotski
+from KlotskiStats import SearchStats
+from KlotskiBatch import ReadLayouts,SolveLayout
+from KlotskiNumpyBFS import VectorBreadthFirstSearch
+from KlotskiExternalBFS import ExternalBFS,ExternalBreadthFirstSearch,ReadRecords
+
+CLASSIC_SOLUTIONS = [116,118,135,137] # Moves of the 4 solutions of the classic layout
+LAYOUTS = {'classic':lambda: CreateNewKP(5,4), # Mirror symmetric
+           'square':lambda: CreateKP([[2,3,0],[4,1,5],[6,7,8]],1,[(1,1)]), # All the 7 symmetries of the square
+           'asymmetric':lambda: CreateKP([[1,1,0],[2,0,3],[4,4,3]],1,[(0,0),(0,1)])} # No symmetry
+SOLVED_LAYOUTS = {'asymmetric':lambda: CreateKP([[1,1,2,3],[4,0,2,5],[6,6,0,7],[8,9,9,7]],1,[(3,2),(3,3)]), # 37 moves, no symmetry
+                  'transpositions':lambda: CreateKP([[0,0,1,1],[7,6,1,1],[4,9,8,8],[0,3,5,2]],1,[(3,1),(3,2)])} # 24 moves, many paths to every state
+
+def RandomWalk(KP,moves,seed = 0):
+    ''' KP objects along a random walk of legal moves from KP (KP included) '''
+    generator = random.Random(seed)
+    walk = [KP]
+    for _ in range(moves):
+        block,action = generator.choice(KP.GetAllValidActions())
+        KP = KP.MoveBlock(block,action)
+        walk.append(KP)
+    return walk
+
+def test_EncodeDecodeRoundTrip():
+    KP = CreateNewKP(5,4)
+    codec = StateCodec(KP)
+    for current in RandomWalk(KP,200):
+        state = codec.Encode(current)
+        blocks,occupied = codec.Blocks(state)
+        expected = sorted((codec.blockClass[block.number],codec.Cell(*BlockAnchor(block.cells))) for block in current.blockList)
+        assert sorted(blocks) == expected
+        assert occupied == sum(1<<codec.Cell(r,c) for r in range(KP.rows) for c in range(KP.cols) if current.grid[r][c])
+        grid = [[codec.blockClass[number] if number else -1 for number in row] for row in current.grid]
+        assert codec.Grid(state) == grid
+
+@pytest.mark.parametrize('layout',sorted(LAYOUTS))
+def test_MoveGenerationMatchesKP(layout):
+    KP = LAYOUTS[layout]()
+    codec = StateCodec(KP)
+    for current in RandomWalk(KP,200,seed = 1):
+        state = codec.Encode(current)
+        expected = {codec.Encode(current.MoveBlock(block,action)) for block,action in current.GetAllValidActions()}
+        moves = codec.GetMoves(state)
+        assert {nextState for move,nextState in moves} == expected
+        assert sorted(codec.GetNeighbors(state)) == sorted(nextState for move,nextState in moves)
+        for move,nextState in moves:
+            block,action = UnpackMoves(current,[move])[0]
+            assert codec.Encode(current.MoveBlock(block,action)) == nextState
+        successors = codec.Successors(state)
+        assert [(move,nextState) for move,nextState,key in successors] == moves
+        for move,nextState,key in successors:
+            assert key == codec.Canonical(nextState) == min([nextState]+codec.Images(nextState))
+
+def test_ClassicSolutionCounts():
+    KP = CreateNewKP(5,4)
+    assert CountSolutions(KP) == (len(CLASSIC_SOLUTIONS),CLASSIC_SOLUTIONS[0])
+    paths = BreadthFirstSearch(KP,asMoves = True)
+    assert [len(path) for path in paths] == CLASSIC_SOLUTIONS
+    for path in paths:
+        current = KP
+        for block,action in path:
+            assert [block,action] in current.GetAllValidActions()
+            current = current.MoveBlock(block,action)
+        assert current.GameWon()
+
+def ScratchActions(KP):
+    ''' Legal moves of a KP computed from scratch '''
+    copy = KlotskiPuzzle(KP.rows,KP.cols,list(KP.blockList),[list(row) for row in KP.grid],KP.goalCells)
+    return copy.GetAllValidActions()
+
+@pytest.mark.parametrize('layout',sorted(LAYOUTS))
+def test_CachedValidActions(layout):
+    KP = LAYOUTS[layout]()
+    for current in RandomWalk(KP,300,seed = 2): # MoveBlock copies carry the legal moves and empty cells
+        assert current.GetAllValidActions() == ScratchActions(current)
+        assert sorted(current.emptyCells) == [(r,c) for r in range(KP.rows) for c in range(KP.cols) if current.grid[r][c]==0]
+    generator = random.Random(3)
+    grid = [list(row) for row in KP.grid]
+    KP.GetAllValidActions()
+    for _ in range(300): # Moves in place, undone every few moves
+        if KP.moveStack and generator.random() < 0.3:
+            KP.UnmakeMove()
+        else:
+            KP.MakeMove(*generator.choice(KP.GetAllValidActions()))
+        assert KP.GetAllValidActions() == ScratchActions(KP)
+    while KP.moveStack:
+        KP.UnmakeMove()
+    assert KP.grid == grid and KP.GetAllValidActions() == ScratchActions(KP)
+
+def test_ShapeClasses():
+    KP = CreateNewKP(5,4)
+    classes = ShapeClasses(KP.blockList)
+    assert classes[10] == 0 and classes[0] == -1
+    assert classes[1] == classes[2] == classes[4] == classes[5] # Vertical 2x1
+    assert classes[3] == classes[6] == classes[8] == classes[9] # 1x1
+    assert len(set(classes.values())) == 5
+    bars = CreateKP([[i+1]*(i+1)+[0]*(26-i) for i in range(27)],1,[(0,0)]) # 27 bars of different lengths
+    assert sorted(ShapeClasses(bars.blockList).values()) == list(range(-1,27))
+
+def test_OptimalSolvers():
+    KP = CreateNewKP(5,4)
+    codec = StateCodec(KP)
+    start = codec.Encode(KP)
+    assert codec.Heuristic(start) <= CLASSIC_SOLUTIONS[0]
+    counts = {}
+    assert len(AStarSearch(KP,codec,counts)) == CLASSIC_SOLUTIONS[0] and counts['expanded'] > 0
+    assert len(BidirectionalSearch(KP,codec)) == CLASSIC_SOLUTIONS[0]
+    fallback = {}
+    assert len(BidirectionalSearch(KP,codec,fallback,maxGoals = 10)) == CLASSIC_SOLUTIONS[0] # Falls back to A*
+    assert fallback['expanded'] == counts['expanded']
+    for current in RandomWalk(KP,100,seed = 4): # Consistent heuristic
+        state = codec.Encode(current)
+        for move,nextState,key,heuristic in codec.GuidedSuccessors(state):
+            assert heuristic == codec.Heuristic(nextState) and abs(heuristic-codec.Heuristic(state)) <= 1
+
+def PlayPath(KP,path):
+    ''' KP after the moves of a path, every move must be legal '''
+    for block,action in path:
+        assert [block,action] in KP.GetAllValidActions()
+        KP = KP.MoveBlock(block,action)
+    return KP
+
+@pytest.mark.parametrize('layout',sorted(SOLVED_LAYOUTS))
+def test_IterativeDeepening(layout):
+    KP = SOLVED_LAYOUTS[layout]()
+    grid = [list(row) for row in KP.grid]
+    path = []
+    assert SolveKlotski(KP,path)
+    assert KP.grid == grid and not KP.moveStack # Restored after the search
+    assert len(path) == CountSolutions(KP)[1]
+    assert PlayPath(KP,path).GameWon()
+
+def test_IterativeDeepeningStats():
+    KP = SOLVED_LAYOUTS['transpositions']()
+    stats = SearchStats()
+    assert SolveKlotski(KP,[],stats = stats)
+    assert [level['iteration'] for level in stats.levels] == list(range(1,len(stats.levels)+1))
+    for level in stats.levels:
+        assert level['duplicates'] == None or level['duplicates'] <= level['generated']
+        assert level['duplicateRate'] == None or 0 <= level['duplicateRate'] <= 1
+    assert stats.Summary()['expanded'] == sum(level['expanded'] for level in stats.levels)
+    assert stats.Summary()['hashSeconds'] > 0 # Transposition table probes
+
+def test_BatchBadLayouts():
+    grid = [list(row) for row in CreateNewKP(5,4).grid]
+    lines = ['# comment','','[1,2]','{"grid": '+str(grid)+', "target": 10, "goal": [[4,1],[4,2]]}','{"name": "broken"',
+             '{"name": "negative", "grid": '+str(grid)+', "target": 10, "goal": [[-1,0]]}',
+             '{"name": "aliased", "grid": '+str(grid)+', "target": 10, "goal": [[1,-1]]}',
+             '{"name": "ragged", "grid": [[1,1],[0]], "target": 1, "goal": [[0,0]]}',
+             '{"name": "missing", "grid": '+str(grid)+'}']
+    layouts = list(ReadLayouts(lines))
+    assert [layout['name'] for layout in layouts] == ['line 3','line 4','line 5','negative','aliased','ragged','missing']
+    results = [SolveLayout(layout) for layout in layouts]
+    assert [('error' in result) for result in results] == [True,False,True,True,True,True,True]
+    assert results[1]['length'] == CLASSIC_SOLUTIONS[0]
+    with pytest.raises(ValueError):
+        CreateKP(grid,10,[(4,1),(4,4)])
+
+def test_ExternalBFS(tmp_path):
+    KP = CreateNewKP(5,4)
+    result = ExternalBreadthFirstSearch(KP,memoryBudget = 2000) # Many small runs, merged 2 at a time
+    assert (result['solutions'],result['shortest']) == (len(CLASSIC_SOLUTIONS),CLASSIC_SOLUTIONS[0])
+    search = ExternalBFS(KP,memoryBudget = 2000,workDir = str(tmp_path))
+    assert search.fanIn == 2
+    generator = random.Random(5)
+    states = [set(generator.randrange(100) for _ in range(20)) for _ in range(9)] # Overlapping runs
+    runs = search.MergeRuns([search.WriteRun(run) for run in states])
+    assert len(runs) <= search.fanIn and len(list(tmp_path.iterdir())) == len(runs) # Merged runs are removed
+    merged = set()
+    for run in runs:
+        values = [int.from_bytes(record,'big') for record in ReadRecords(run,search.recordSize)]
+        assert values == sorted(set(values))
+        merged.update(values)
+    assert merged == set().union(*states)
+
+@pytest.mark.parametrize('layout',['classic']+sorted(SOLVED_LAYOUTS))
+def test_VectorBFS(layout):
+    KP = LAYOUTS[layout]() if layout == 'classic' else SOLVED_LAYOUTS[layout]()
+    stats = SearchStats()
+    count,shortest = CountSolutions(KP,stats = stats)
+    visited = [1]+[level['visited'] for level in stats.levels]
+    levels = [after-before for before,after in zip(visited,visited[1:]) if after > before]
+    assert stats.Summary()['hashSeconds'] == None # BFS keys come from Successors and aren't timed apart
+    result = VectorBreadthFirstSearch(KP)
+    assert (result['solutions'],result['shortest']) == (count,shortest)
+    assert result['levels'] == [1]+levels and result['visited'] == visited[-1]